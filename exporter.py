@@ -1,25 +1,52 @@
 import argparse
+import atexit
+import functools
+import json
 import os
+import imaplib
 import logging
 import time
 import sqlite3
+from types import SimpleNamespace
+from typing import Optional, Set
 from mail import Mailbox, IMAPMailbox, ExchangeMailbox, Mail
+from utils import uid_hash
 import importlib
 
+MAILBOX_CLASSES = {"IMAP": IMAPMailbox, "Exchange": ExchangeMailbox}
 
+
+@functools.lru_cache(maxsize=None)
 def get_attachment_handler_class(handler_str):
     mod = importlib.import_module(".".join(handler_str.split(".")[:-1]))
     cl = getattr(mod, handler_str.split(".")[-1])
     return cl
 
 
-class Config:
-    def __init__(self, config_dict):
-        for k, v in config_dict.items():
-            if isinstance(v, dict):
-                setattr(self, k, Config(v))
-            else:
-                setattr(self, k, v)
+def make_config(config_dict: dict, raw_keys=("filters",)) -> SimpleNamespace:
+    """
+    Converts the nested settings dict into namespaces for attribute access.
+
+    Values stored under one of raw_keys are kept as plain dicts, since they are
+    passed on as keyword-like mappings (e.g. the mailbox filters).
+
+    Args:
+        config_dict (dict): The settings.
+        raw_keys (tuple): Keys whose dict values are not converted.
+
+    Returns:
+        SimpleNamespace: The settings as (nested) namespace.
+    """
+    return SimpleNamespace(
+        **{
+            k: (
+                make_config(v, raw_keys)
+                if isinstance(v, dict) and k not in raw_keys
+                else v
+            )
+            for k, v in config_dict.items()
+        }
+    )
 
 
 def init_db(db_name: str = "processed_emails.db") -> sqlite3.Connection:
@@ -27,7 +54,20 @@ def init_db(db_name: str = "processed_emails.db") -> sqlite3.Connection:
     Initializes the SQLite database for storing processed emails.
 
     This function creates a new SQLite database or connects to an existing one.
-    It also creates a table named 'processed_emails' if it does not already exist.
+    It also creates a table named 'processed_emails' if it does not already exist,
+    an 'attachments' table with one row per attachment path of an email,
+    as well as a 'meta' key-value table for bookkeeping such as the last processed UID.
+    The table is keyed by a fixed-size hash of the email's key (see Mailbox.mail_key and
+    utils.uid_hash); tables created by older versions, which were keyed by the UID itself,
+    are migrated. Rows stored without a key get their UID as key; download_attachments
+    later scopes those of IMAP emails by folder and UIDVALIDITY (see Mail.scope_keys).
+    Attachment lists that older versions stored as JSON in the 'attachments' column
+    are copied into the 'attachments' table.
+
+    The database runs in WAL mode with synchronous=NORMAL: commits are not synced
+    to disk one by one, so the last transactions can be lost on a power failure
+    (never on a crash of the process alone). Emails lost this way are downloaded
+    again on the next run, unless they were already moved to trash.
 
     Args:
         db_name (str): The name of the SQLite database file. Defaults to "processed_emails.db".
@@ -35,25 +75,150 @@ def init_db(db_name: str = "processed_emails.db") -> sqlite3.Connection:
     Returns:
         sqlite3.Connection: A connection object to the SQLite database.
     """
-    logging.debug(f"Initializing the database: {db_name}")
+    logging.debug("Initializing the database: %s", db_name)
     conn = sqlite3.connect(db_name)
     cursor = conn.cursor()
+    # WAL with synchronous=NORMAL only syncs on checkpoints instead of on every
+    # commit; the remaining pragmas keep pages and temporary data in memory.
+    for pragma in [
+        "journal_mode=WAL",
+        "synchronous=NORMAL",
+        "cache_size=-64000",
+        "temp_store=MEMORY",
+        "mmap_size=268435456",
+    ]:
+        cursor.execute(f"PRAGMA {pragma}")
+    columns = [row[1] for row in cursor.execute("PRAGMA table_info(processed_emails)")]
+    tables = [
+        row[0]
+        for row in cursor.execute("SELECT name FROM sqlite_master WHERE type = 'table'")
+    ]
+    if columns and "uid_hash" not in columns:
+        logging.info("Migrating 'processed_emails' to hashed UID keys.")
+        cursor.execute("BEGIN")
+        cursor.execute("ALTER TABLE processed_emails RENAME TO processed_emails_old")
     cursor.execute("""
         CREATE TABLE IF NOT EXISTS processed_emails (
-            uid TEXT PRIMARY KEY,
+            uid_hash BLOB PRIMARY KEY,
+            uid TEXT,
             subject TEXT,
             sender TEXT,
             recipient TEXT,
             date TEXT,
             body TEXT,
-            attachments TEXT
+            mail_key TEXT
+        )
+    """)
+    cursor.execute("""
+        CREATE TABLE IF NOT EXISTS attachments (
+            uid_hash BLOB,
+            idx INTEGER,
+            path TEXT,
+            PRIMARY KEY (uid_hash, idx)
+        ) WITHOUT ROWID
+    """)
+    cursor.execute("CREATE INDEX IF NOT EXISTS attachments_path ON attachments (path)")
+    conn.create_function("uid_hash", 1, uid_hash, deterministic=True)
+    if columns and "uid_hash" not in columns:
+        cursor.execute("""
+            INSERT OR IGNORE INTO processed_emails
+                (uid_hash, uid, subject, sender, recipient, date, body, mail_key)
+            SELECT uid_hash(uid), uid, subject, sender, recipient, date, body, uid
+            FROM processed_emails_old
+        """)
+    if "attachments" in columns and "attachments" not in tables:
+        logging.info("Moving the attachment lists into the 'attachments' table.")
+        source = "processed_emails" if "uid_hash" in columns else "processed_emails_old"
+        cursor.execute(f"""
+            INSERT OR IGNORE INTO attachments (uid_hash, idx, path)
+            SELECT uid_hash(mail.uid), attachment.key, attachment.value
+            FROM {source} AS mail, json_each(mail.attachments) AS attachment
+            WHERE json_valid(mail.attachments)
+        """)
+    if columns and "uid_hash" not in columns:
+        cursor.execute("DROP TABLE processed_emails_old")
+    elif columns and "mail_key" not in columns:
+        logging.info("Adding the 'mail_key' column to 'processed_emails'.")
+        cursor.execute("ALTER TABLE processed_emails ADD COLUMN mail_key TEXT")
+        cursor.execute("UPDATE processed_emails SET mail_key = uid")
+    # the primary key index on the hashes already covers the preload of all
+    # processed keys, a second index would only slow down every insert
+    cursor.execute("DROP INDEX IF EXISTS processed_emails_uid")
+    cursor.execute("DROP INDEX IF EXISTS processed_emails_key")
+    cursor.execute("""
+        CREATE TABLE IF NOT EXISTS meta (
+            key TEXT PRIMARY KEY,
+            value TEXT
         )
     """)
     conn.commit()
-    logging.info(f"Database {db_name} initialized successfully.")
+    logging.info("Database %s initialized successfully.", db_name)
     return conn
 
 
+def optimize_db(conn: sqlite3.Connection):
+    """
+    Lets SQLite refresh its query planner statistics where needed.
+
+    SQLite recommends running 'PRAGMA optimize' periodically and before closing
+    long-lived connections, so that lookups on the growing 'processed_emails'
+    table keep using good query plans.
+
+    Args:
+        conn (sqlite3.Connection): The SQLite database connection object.
+    """
+    logging.debug("Optimizing the database.")
+    conn.execute("PRAGMA optimize")
+
+
+def get_meta(conn: sqlite3.Connection, key: str) -> Optional[str]:
+    """
+    Reads a value from the 'meta' table.
+
+    Args:
+        conn (sqlite3.Connection): The SQLite database connection object.
+        key (str): The key of the value.
+
+    Returns:
+        Optional[str]: The stored value, or None if the key is not set.
+    """
+    row = conn.execute("SELECT value FROM meta WHERE key = ?", (key,)).fetchone()
+    return row[0] if row else None
+
+
+def set_meta(conn: sqlite3.Connection, key: str, value: str):
+    """
+    Stores a value in the 'meta' table.
+
+    Args:
+        conn (sqlite3.Connection): The SQLite database connection object.
+        key (str): The key of the value.
+        value (str): The value to store.
+    """
+    with conn:
+        conn.execute(
+            "INSERT OR REPLACE INTO meta (key, value) VALUES (?, ?)", (key, value)
+        )
+
+
+def close_mailbox(mailbox: Mailbox):
+    """
+    Closes the connection to the mailbox, ignoring errors of an already broken connection.
+
+    Args:
+        mailbox (Mailbox): The Mailbox object to close.
+    """
+    try:
+        mailbox.close()
+        logging.info("Disconnected from the email server.")
+    except Exception as e:
+        logging.debug("Error while closing the mailbox connection: %s", e)
+
+
+# filters that select emails regardless of their UID, see download_attachments
+NON_INCREMENTAL_FILTERS = ("is_read", "min_age_days", "before")
+
+
 def download_attachments(
     mailbox: Mailbox,
     conn: sqlite3.Connection,
@@ -61,6 +226,10 @@ def download_attachments(
     filters: dict = {},
     delete_mails: bool = False,
     public_folder: bool = False,
+    commit_every: int = 64,
+    processed_keys: Optional[Set[bytes]] = None,
+    compress_bodies: bool = False,
+    max_fetch_attempts: int = 3,
 ):
     """
     Downloads attachments from emails in the specified folder.
@@ -74,36 +243,155 @@ def download_attachments(
         conn (sqlite3.Connection): The SQLite database connection object.
         folder (str): The name of the email folder to search for attachments. Defaults to "inbox".
         attachment_dir (str): The directory where the downloaded attachments will be saved. Defaults to "attachments".
+        commit_every (int): Number of downloaded emails that are saved to the database in one
+            transaction. Emails are only moved to trash once they have been saved. Defaults to 64.
+        processed_keys (Optional[Set[bytes]]): In-memory set of the hashed keys of already
+            processed emails (see Mailbox.mail_key and utils.uid_hash), e.g. from
+            Mail.load_processed_keys. The hashed keys of newly saved emails are added to it.
+            If None, the database is queried.
+        compress_bodies (bool): Whether the email bodies are stored zlib compressed. Defaults to False.
+        max_fetch_attempts (int): Number of runs in which an email may fail to be fetched before
+            the search no longer waits for it. Defaults to 3.
 
     Returns:
-        None
+        int: The number of newly processed emails.
     """
     mailbox.select_folder(folder, public_folder)
-    uids = mailbox.search_emails(filters)
-    mailbox.delete_emails = delete_mails
-    skipped_emails = 0
-
+    # Only search for emails newer than the last processed UID. Some filters match
+    # emails independently of their UID: the read state of older emails can change,
+    # and an old email copied into the folder gets a new UID but keeps its date, so
+    # it matches BEFORE while newer emails with lower UIDs do not yet. With such a
+    # filter every search has to cover the whole folder.
+    last_uid_key = f"last_uid:{folder}"
+    failures_key = f"fetch_failures:{folder}"
+    incremental = mailbox.incremental_search and not any(
+        name in filters for name in NON_INCREMENTAL_FILTERS
+    )
+    since_uid = get_meta(conn, last_uid_key) if incremental else None
+    if mailbox.uid_validity is not None:
+        uid_validity_key = f"uid_validity:{folder}"
+        stored_uid_validity = get_meta(conn, uid_validity_key)
+        scoped_keys_key = f"scoped_keys:{folder}"
+        if get_meta(conn, scoped_keys_key) is None:
+            # emails saved by older versions are keyed by their bare UID, they belong
+            # to the numbering that was current when they were saved
+            prefix = mailbox.mail_key("", uid_validity=stored_uid_validity)
+            scoped_uids = Mail.scope_keys(conn, prefix)
+            if scoped_uids:
+                logging.info(
+                    "Scoped the keys of %s emails to folder %s.",
+                    len(scoped_uids),
+                    folder,
+                )
+            if processed_keys is not None:
+                processed_keys.difference_update(uid_hash(uid) for uid in scoped_uids)
+                processed_keys.update(uid_hash(prefix + uid) for uid in scoped_uids)
+            set_meta(conn, scoped_keys_key, "1")
+        if stored_uid_validity != mailbox.uid_validity:
+            # the stored UID is meaningless once the server has renumbered the folder;
+            # the keys of the processed emails include the UIDVALIDITY, so renumbered
+            # emails are not mistaken for processed ones
+            if incremental and since_uid is not None:
+                logging.warning(
+                    "UIDVALIDITY of folder %s changed, searching the whole folder.",
+                    folder,
+                )
+            since_uid = None
+            # drop the old watermark with it, so that a cycle which is aborted or
+            # finds nothing does not leave it behind for the new numbering
+            with conn:
+                conn.execute(
+                    "INSERT OR REPLACE INTO meta (key, value) VALUES (?, ?)",
+                    (uid_validity_key, mailbox.uid_validity),
+                )
+                conn.execute(
+                    "DELETE FROM meta WHERE key IN (?, ?)",
+                    (last_uid_key, failures_key),
+                )
+    uids = mailbox.search_emails(filters, since_uid=since_uid)
+    mailbox.delete_mails = delete_mails
+    mail_keys = [mailbox.mail_key(uid) for uid in uids]
+    keys = {uid: uid_hash(key) for uid, key in zip(uids, mail_keys)}
+    if processed_keys is None:
+        processed_keys = Mail.processed_keys(mail_keys, conn)
+    new_uids = []
     for uid in uids:
-        if Mail.already_processed(uid, conn):
-            logging.debug(f"Email with UID {uid} has already been processed. Skipping.")
-            skipped_emails += 1
-            continue
-        try:
-            mail = mailbox.get_mail(uid)
-            if not mail:
-                continue
-            mail.to_sqlite_db(conn)
-        except Exception as e:
-            logging.error(
-                f"Error while getting mail and downloading attachment (UID {uid})"
+        if keys[uid] in processed_keys:
+            logging.debug(
+                "Email with UID %s has already been processed. Skipping.", uid
             )
-            raise e
-        finally:
+        else:
+            new_uids.append(uid)
+    skipped_emails = len(uids) - len(new_uids)
+    processed_emails = 0
+    pending = []
+
+    def flush():
+        Mail.bulk_save(pending, conn, compress_body=compress_bodies)
+        mailbox.mark_processed([mail.uid for mail in pending])
+        for mail in pending:
+            processed_keys.add(uid_hash(mail.key))
             if delete_mails:
-                mailbox.trash_mail(uid)
-
-    logging.info(f"Processed {len(uids) - skipped_emails} emails.")
-    logging.info(f"Skipped {skipped_emails} emails already processed.")
+                mailbox.trash_mail(mail.uid)
+        pending.clear()
+
+    try:
+        for mail in mailbox.get_mails(new_uids):
+            pending.append(mail)
+            processed_emails += 1
+            if len(pending) >= commit_every:
+                flush()
+    finally:
+        try:
+            # persist whatever has been downloaded so far, also if the loop was aborted
+            if pending:
+                flush()
+        finally:
+            mailbox.forget_unprocessed()
+    mailbox.expunge()
+
+    if incremental:
+        # advance to the highest UID up to which all found emails are processed,
+        # so that emails which could not be fetched are searched for again; emails
+        # that no longer exist or keep failing do not hold it back forever
+        stored_failures = get_meta(conn, failures_key) or "{}"
+        failures = json.loads(stored_failures)
+        skipped = set()
+        unprocessed = [uid for uid in uids if keys[uid] not in processed_keys]
+        if unprocessed:
+            existing = mailbox.existing_uids(unprocessed)
+            for uid in unprocessed:
+                if uid not in existing:
+                    logging.info("Email with UID %s no longer exists.", uid)
+                    skipped.add(uid)
+                    continue
+                failures[uid] = failures.get(uid, 0) + 1
+                if failures[uid] >= max_fetch_attempts:
+                    logging.warning(
+                        "Giving up on email with UID %s after %s failed attempts.",
+                        uid,
+                        failures[uid],
+                    )
+                    skipped.add(uid)
+        last_uid = since_uid
+        for uid in sorted(uids, key=int):
+            if keys[uid] not in processed_keys and uid not in skipped:
+                break
+            last_uid = uid
+        if last_uid != since_uid:
+            set_meta(conn, last_uid_key, last_uid)
+        # emails at or below the watermark are not searched for again
+        failures = {
+            uid: attempts
+            for uid, attempts in failures.items()
+            if last_uid is None or int(uid) > int(last_uid)
+        }
+        if json.dumps(failures) != stored_failures:
+            set_meta(conn, failures_key, json.dumps(failures))
+
+    logging.info("Processed %s emails.", processed_emails)
+    logging.info("Skipped %s emails already processed.", skipped_emails)
+    return processed_emails
 
 
 def main():
@@ -113,7 +401,7 @@ def main():
     parser.add_argument("--config", help="path to configuration file (YAML format)")
     parser.add_argument(
         "--mailbox-type",
-        choices=["IMAP", "Exchange"],
+        choices=list(MAILBOX_CLASSES),
         help="Type of mailbox to connect to (IMAP or Exchange). Default is 'IMAP'.",
     )
     parser.add_argument(
@@ -128,6 +416,27 @@ def main():
         "--interval",
         help="Check interval in seconds to look for new emails. Default is 60 seconds.",
     )
+    parser.add_argument(
+        "--max-interval",
+        help="Upper limit in seconds for the check interval, which doubles after every check without new emails. Default is the check interval, which disables the backoff.",
+    )
+    parser.add_argument(
+        "--workers",
+        help="Number of threads used to parse emails and write their attachments. Default is 4.",
+    )
+    parser.add_argument(
+        "--connections",
+        help="Number of connections used to fetch emails in parallel (only for IMAP). Default is 1.",
+    )
+    parser.add_argument(
+        "--fetch-batch-size",
+        help="Number of emails requested with a single FETCH command (only for IMAP). Default is 100.",
+    )
+    parser.add_argument(
+        "--mode",
+        choices=["full", "metadata"],
+        help="'metadata' only stores the metadata and attachments of emails and never downloads their text body (only for IMAP). Default is 'full'.",
+    )
     parser.add_argument(
         "--db",
         help="Path to SQLite database for storing processed email UIDs and metadata. Default is '.attachhound/processed_emails.db'.",
@@ -181,8 +490,18 @@ def main():
             "password": None,
             "folder": "inbox",
             "public": False,
+            "fetch_batch_size": 100,
+            "partial_fetch": False,
+            "connections": 1,
+            "skip_body_without_attachments": False,
+            "mode": "full",
+            "compress": False,
         },
         "interval": 60,
+        "max_interval": None,
+        "max_connection_age": 1500,
+        "workers": 4,
+        "compress_bodies": False,
         "module": "mail.SimpleExporter",
         "directory": ".attachhound/attachments",
         "database": ".attachhound/processed_emails.db",
@@ -196,10 +515,12 @@ def main():
                 d1[k] = v
         return d1
 
+    config_updates = {}
     if args.config is not None:
         import yaml
 
-        config_updates = yaml.safe_load(open(args.config, "r"))
+        with open(args.config, "r") as fin:
+            config_updates = yaml.safe_load(fin) or {}
         config_dict = deep_update(config_dict, config_updates)
     if "mailbox" in config_dict:
         if "filters" not in config_dict["mailbox"]:
@@ -213,6 +534,11 @@ def main():
         "public_folder": "mailbox:public",
         "delete": "mailbox:delete",
         "interval": "interval",
+        "max_interval": "max_interval",
+        "workers": "workers",
+        "connections": "mailbox:connections",
+        "fetch_batch_size": "mailbox:fetch_batch_size",
+        "mode": "mailbox:mode",
         "attachment_dir": "directory",
         "db": "database",
     }.items():
@@ -230,74 +556,135 @@ def main():
                 current[k] = {}
             current = current[k]
         current[key_list[-1]] = value
-    config = Config(config_dict)
+    config = make_config(config_dict)
 
     if not config.mailbox.email or not config.mailbox.password:
         logging.error("Email or password not provided.")
         raise SystemExit(
             "Please provide an email and password either via command line or environment variables."
         )
+    if int(config.mailbox.fetch_batch_size) < 1:
+        logging.error("Invalid fetch batch size: %s", config.mailbox.fetch_batch_size)
+        raise SystemExit("The fetch batch size must be at least 1.")
 
     logging.info("Starting the email attachment downloader script.")
-    logging.info(f"Checking for new emails every {config.interval} seconds.")
-    logging.info(f"Using email address: {config.mailbox.email}")
+    logging.info("Checking for new emails every %s seconds.", config.interval)
+    logging.info("Using email address: %s", config.mailbox.email)
     logging.debug(
-        f"Database path: {config.database}, Attachment directory: {config.directory}"
+        "Database path: %s, Attachment directory: %s", config.database, config.directory
     )
     logging.info("Ensuring necessary directories exist...")
 
-    # Create the directory for attachments if it doesn't exist
-    if not os.path.exists(config.directory):
-        os.makedirs(config.directory)
-        logging.info(f"Created directory for attachments: {config.directory}")
-    else:
-        logging.debug(f"Attachment directory already exists: {config.directory}")
-
-    # Create the directory for the SQLite database if it doesn't exist
+    # Create the directories for attachments and the SQLite database if they don't exist
+    os.makedirs(config.directory, exist_ok=True)
+    logging.debug("Attachment directory: %s", config.directory)
     db_dir = os.path.dirname(config.database)
-    if not os.path.exists(db_dir):
-        os.makedirs(db_dir)
-        logging.info(f"Created directory for SQLite database: {db_dir}")
-    else:
-        logging.debug(f"SQLite database directory already exists: {db_dir}")
+    if db_dir:
+        os.makedirs(db_dir, exist_ok=True)
+        logging.debug("SQLite database directory: %s", db_dir)
 
     # Initialize the SQLite database
     conn = init_db(config.database)
-    logging.info(f"SQLite database initialized at {config.database}")
-
-    while True:
-        try:
-            # Connect to the email server and download attachments
-            mailbox_class = {"IMAP": IMAPMailbox, "Exchange": ExchangeMailbox}[
-                config.mailbox.type
-            ]
-            mailbox = mailbox_class(
-                server=config.mailbox.server,
-                export_directory=config.directory,
-                attachment_handler=get_attachment_handler_class(config.module),
-            )
-            mailbox.connect(config.mailbox.email, config.mailbox.password)
-            logging.info("Connected to the email server successfully.")
-
-            download_attachments(
-                mailbox,
-                conn,
-                folder=config.mailbox.folder,
-                filters=config.mailbox.filters.__dict__,
-                delete_mails=config.mailbox.delete,
-                public_folder=config.mailbox.public,
-            )
-            logging.info("Attachment download and metadata storage completed.")
-        except Exception as e:
-            logging.error(f"An error occurred during the process: {e}")
-        finally:
-            mailbox.close()
-            logging.info("Disconnected from the email server.")
-
-            logging.info(
-                f"Waiting for {config.interval} seconds before the next run..."
-            )
-            time.sleep(int(config.interval))
+    logging.info("SQLite database initialized at %s", config.database)
+    atexit.register(optimize_db, conn)
+    processed_keys = Mail.load_processed_keys(conn)
+    logging.debug("Loaded %s processed email keys.", len(processed_keys))
+
+    base_interval = int(config.interval)
+    if config.max_interval is None:
+        max_interval = base_interval
+    else:
+        max_interval = max(int(config.max_interval), base_interval)
+    interval = base_interval
+    max_connection_age = int(config.max_connection_age)
+    mailbox = None
+    connected_at = 0.0
+    try:
+        while True:
+            new_emails = None
+            try:
+                if mailbox is not None and (
+                    time.monotonic() - connected_at > max_connection_age
+                ):
+                    # servers drop idle connections after a while (e.g. iCloud after
+                    # ~30 minutes), so the connection is renewed before that happens
+                    logging.info("Renewing the connection to the email server.")
+                    close_mailbox(mailbox)
+                    mailbox = None
+                if mailbox is not None:
+                    try:
+                        mailbox.noop()
+                    except (imaplib.IMAP4.abort, OSError) as e:
+                        logging.warning(
+                            "Lost the connection to the email server (%s). Reconnecting...",
+                            e,
+                        )
+                        close_mailbox(mailbox)
+                        mailbox = None
+                if mailbox is None:
+                    # Connect to the email server, the connection is kept open
+                    # across cycles and only rebuilt after an error
+                    mailbox_class = MAILBOX_CLASSES[config.mailbox.type]
+                    mailbox_kwargs = {}
+                    if mailbox_class is IMAPMailbox:
+                        mailbox_kwargs["port"] = int(config.mailbox.port)
+                        mailbox_kwargs["fetch_batch_size"] = int(
+                            config.mailbox.fetch_batch_size
+                        )
+                        # the metadata mode only fetches the headers and attachments
+                        metadata_mode = config.mailbox.mode == "metadata"
+                        mailbox_kwargs["partial_fetch"] = metadata_mode or bool(
+                            config.mailbox.partial_fetch
+                        )
+                        mailbox_kwargs["store_body"] = not metadata_mode
+                        mailbox_kwargs["compress"] = bool(config.mailbox.compress)
+                        mailbox_kwargs["connections"] = int(config.mailbox.connections)
+                        mailbox_kwargs["skip_body_without_attachments"] = bool(
+                            config.mailbox.skip_body_without_attachments
+                        )
+                    mailbox = mailbox_class(
+                        server=config.mailbox.server,
+                        export_directory=config.directory,
+                        attachment_handler=get_attachment_handler_class(config.module),
+                        workers=int(config.workers),
+                        **mailbox_kwargs,
+                    )
+                    mailbox.connect(config.mailbox.email, config.mailbox.password)
+                    connected_at = time.monotonic()
+                    logging.info("Connected to the email server successfully.")
+
+                new_emails = download_attachments(
+                    mailbox,
+                    conn,
+                    folder=config.mailbox.folder,
+                    filters=config.mailbox.filters,
+                    delete_mails=config.mailbox.delete,
+                    public_folder=config.mailbox.public,
+                    # one transaction per FETCH batch
+                    commit_every=int(config.mailbox.fetch_batch_size),
+                    processed_keys=processed_keys,
+                    compress_bodies=bool(config.compress_bodies),
+                )
+                logging.info("Attachment download and metadata storage completed.")
+            except Exception as e:
+                logging.error("An error occurred during the process: %s", e)
+                if mailbox is not None:
+                    close_mailbox(mailbox)
+                    mailbox = None
+            finally:
+                optimize_db(conn)
+
+                # back off while the mailbox is quiet, go back to the base interval
+                # as soon as new emails show up or a run fails
+                if new_emails == 0:
+                    interval = min(interval * 2, max_interval)
+                else:
+                    interval = base_interval
+                logging.info("Waiting for %s seconds before the next run...", interval)
+                time.sleep(interval)
+    finally:
+        if mailbox is not None:
+            close_mailbox(mailbox)
 
 
 if __name__ == "__main__":
@@ -1,15 +1,92 @@
 from abc import ABC, abstractmethod
 from exchangelib import Credentials, Account, Configuration, Message, FileAttachment
-from typing import List, Dict, Optional
+from typing import Callable, List, Dict, Iterator, NamedTuple, Optional, Set
+import hashlib
 import logging
 import os
+import re
 import imaplib
+import itertools
 import email
+import email.utils
+import base64
+import collections
+import binascii
+import functools
+import queue
+import quopri
+import threading
+import zlib
+from concurrent.futures import ThreadPoolExecutor
 from email.header import decode_header
+from email.parser import BytesHeaderParser, BytesParser
+from email.policy import compat32
 import json
 import sqlite3
 from datetime import datetime
-from utils import sanitize_filename, increment_filename, CutOffDate
+from utils import (
+    sanitize_filename,
+    increment_filename,
+    uid_hash,
+    compress_text,
+    html_to_text,
+    CutOffDate,
+)
+
+_LOG = logging.getLogger(__name__)
+
+# parsers only keep their policy between calls, so all threads share them
+_PARSER = BytesParser(policy=compat32)
+# only parses the header block, the headers fetched by IMAPMailbox.partial_fetch have no body
+_HEADER_PARSER = BytesHeaderParser(policy=compat32)
+
+
+def _join_decoded_header(value) -> str:
+    chunks = []
+    for chunk, charset in decode_header(value):
+        if isinstance(chunk, bytes):
+            try:
+                chunk = chunk.decode(charset or "ascii", errors="replace")
+            except LookupError:
+                chunk = chunk.decode("utf-8", errors="replace")
+        chunks.append(chunk)
+    return "".join(chunks)
+
+
+# subjects and file names repeat a lot (e.g. notifications and mailing lists)
+_decode_header_cached = functools.lru_cache(maxsize=4096)(_join_decoded_header)
+
+
+def _parse_date(date_str) -> Optional[datetime]:
+    try:
+        return email.utils.parsedate_to_datetime(date_str)
+    except (TypeError, ValueError):
+        _LOG.error("Failed to parse date: %s", date_str)
+        return None
+
+
+# emails sent in bulk share their Date header
+_parse_date_cached = functools.lru_cache(maxsize=1024)(_parse_date)
+
+
+def _decode_text(payload: bytes, charset: Optional[str]) -> str:
+    try:
+        return payload.decode(charset or "utf-8", errors="replace")
+    except LookupError:
+        return payload.decode("utf-8", errors="replace")
+
+
+def _iter_leaf_parts(msg) -> Iterator[email.message.Message]:
+    # like Message.walk without the containers, but an attached email stays a single
+    # part, as in the BODYSTRUCTURE that IMAPMailbox.partial_fetch works with
+    if not msg.is_multipart():
+        yield msg
+        return
+    for part in msg.get_payload():
+        if part.is_multipart() and part.get_content_type() != "message/rfc822":
+            yield from _iter_leaf_parts(part)
+        else:
+            yield part
 
 
 class Mail:
@@ -24,8 +101,20 @@ class Mail:
         date (str): The date when the mail was sent.
         body (str): The body content of the mail.
         attachments (List[str]): List of attachment file paths associated with the mail.
+        key (str): The key under which the mail is stored in the database (see Mailbox.mail_key).
     """
 
+    # one statement text for all inserts, so that sqlite3's statement cache
+    # hands out the same prepared statement every time
+    _insert_sql = (
+        "INSERT OR IGNORE INTO processed_emails"
+        " (uid_hash, uid, subject, sender, recipient, date, body, mail_key)"
+        " VALUES (?, ?, ?, ?, ?, ?, ?, ?)"
+    )
+    _insert_attachments_sql = (
+        "INSERT OR IGNORE INTO attachments (uid_hash, idx, path) VALUES (?, ?, ?)"
+    )
+
     def __init__(
         self,
         uid: str,
@@ -35,6 +124,7 @@ class Mail:
         date: str,
         body: str,
         attachments: List[str],
+        key: Optional[str] = None,
     ):
         """
         Initializes the Mail object.
@@ -47,6 +137,8 @@ class Mail:
             date (str): Date when the email was sent.
             body (str): Body content of the email.
             attachments (List[str]): List of attachment file paths.
+            key (Optional[str]): Key under which the email is stored in the database.
+                Defaults to the UID.
         """
         self.uid = uid
         self.subject = subject
@@ -55,6 +147,7 @@ class Mail:
         self.date = date
         self.body = body
         self.attachments = attachments
+        self.key = uid if key is None else key
 
     def to_dict(self):
         """
@@ -73,32 +166,104 @@ class Mail:
             "attachments": json.dumps(self.attachments),
         }
 
-    def to_sqlite_db(self, conn: sqlite3.Connection):
+    def to_row(self, compress_body: bool = False) -> tuple:
         """
-        Save the email metadata to the SQLite database.
+        Converts the Mail object to a row of the 'processed_emails' table.
+
+        The attachments are not part of the row, they are stored in the
+        'attachments' table (see attachment_rows).
 
         Args:
-            conn (sqlite3.Connection): Connection object to the SQLite database.
+            compress_body (bool): Whether the body is stored compressed (see utils.compress_text)
+                instead of as text.
+
+        Returns:
+            tuple: The column values in the order uid_hash, uid, subject, sender, recipient, date, body, mail_key.
         """
-        logging.info(f"Saving metadata for email UID {self.uid}")
-        cursor = conn.cursor()
-        cursor.execute(
-            """
-            INSERT INTO processed_emails (uid, subject, sender, recipient, date, body, attachments)
-            VALUES (?, ?, ?, ?, ?, ?, ?)
-            """,
+        return (
+            uid_hash(self.key),
+            self.uid,
+            self.subject,
+            self.sender,
+            self.recipient,
+            self.date,
             (
-                self.uid,
-                self.subject,
-                self.sender,
-                self.recipient,
-                self.date,
-                self.body,
-                json.dumps(self.attachments),
+                compress_text(self.body)
+                if compress_body and self.body is not None
+                else self.body
             ),
+            self.key,
         )
-        conn.commit()
-        logging.debug(f"Metadata for email UID {self.uid} saved to database.")
+
+    def attachment_rows(self) -> List[tuple]:
+        """
+        Converts the attachments of the Mail object to rows of the 'attachments' table.
+
+        Returns:
+            List[tuple]: One (uid_hash, idx, path) row per attachment, in the order of the attachments.
+        """
+        key = uid_hash(self.key)
+        return [(key, idx, path) for idx, path in enumerate(self.attachments)]
+
+    def to_sqlite_db(
+        self, conn: sqlite3.Connection, commit: bool = True, compress_body: bool = False
+    ) -> bool:
+        """
+        Save the email metadata to the SQLite database.
+
+        Emails that are already stored are left untouched, the primary key makes
+        SQLite skip the duplicate row.
+
+        Args:
+            conn (sqlite3.Connection): Connection object to the SQLite database.
+            commit (bool): Whether to commit right away. Callers that save many
+                mails can pass False and commit once for the whole batch.
+            compress_body (bool): Whether the body is stored compressed.
+
+        Returns:
+            bool: True if the email was newly added, False if it was already stored.
+        """
+        _LOG.info("Saving metadata for email UID %s", self.uid)
+        cursor = conn.execute(self._insert_sql, self.to_row(compress_body))
+        conn.executemany(self._insert_attachments_sql, self.attachment_rows())
+        if commit:
+            conn.commit()
+        if cursor.rowcount == 0:
+            _LOG.debug("Email UID %s is already stored in the database.", self.uid)
+            return False
+        _LOG.debug("Metadata for email UID %s saved to database.", self.uid)
+        return True
+
+    @classmethod
+    def bulk_save(
+        cls, mails: List["Mail"], conn: sqlite3.Connection, compress_body: bool = False
+    ) -> int:
+        """
+        Save the metadata of many emails to the SQLite database in one transaction.
+
+        The emails and their attachments are each inserted with a single
+        executemany call, which reuses the prepared statement, and committed
+        together. Emails that are already stored are ignored.
+
+        Args:
+            mails (List[Mail]): The emails to save.
+            conn (sqlite3.Connection): Connection object to the SQLite database.
+            compress_body (bool): Whether the bodies are stored compressed.
+
+        Returns:
+            int: The number of newly added emails.
+        """
+        _LOG.info("Saving metadata for %s emails", len(mails))
+        with conn:
+            added = conn.executemany(
+                cls._insert_sql, [mail.to_row(compress_body) for mail in mails]
+            ).rowcount
+            conn.executemany(
+                cls._insert_attachments_sql,
+                [row for mail in mails for row in mail.attachment_rows()],
+            )
+        _LOG.debug("Metadata for %s new emails saved to database.", added)
+        return added
 
     def in_db(self, conn: sqlite3.Connection) -> bool:
         """
@@ -110,7 +275,7 @@ class Mail:
         Returns:
             bool: True if the email is already processed, False otherwise.
         """
-        return self.already_processed(self.uid, conn)
+        return self.already_processed(self.key, conn)
 
     @staticmethod
     def already_processed(uid: str, conn: sqlite3.Connection) -> bool:
@@ -118,52 +283,193 @@ class Mail:
         Check if an email has already been processed.
 
         Args:
-            uid (str): The UID of the email to check.
+            uid (str): The key of the email to check (see Mailbox.mail_key).
             conn (sqlite3.Connection): Connection object to the SQLite database.
 
         Returns:
             bool: True if the email has already been processed, False otherwise.
         """
-        logging.debug(f"Checking if email with UID {uid} has already been processed.")
+        _LOG.debug("Checking if email with UID %s has already been processed.", uid)
+        row = conn.execute(
+            "SELECT 1 FROM processed_emails WHERE uid_hash = ?", (uid_hash(uid),)
+        ).fetchone()
+        return row is not None
+
+    @staticmethod
+    def processed_keys(
+        keys: List[str], conn: sqlite3.Connection, chunk_size: int = 900
+    ) -> Set[bytes]:
+        """
+        Determine which of the given emails have already been processed.
+
+        The lookup is done with one query per chunk of keys instead of one query
+        per key. The chunk size stays below SQLite's default limit of 999 bound
+        parameters per statement.
+
+        Args:
+            keys (List[str]): The keys of the emails to check (see Mailbox.mail_key).
+            conn (sqlite3.Connection): Connection object to the SQLite database.
+            chunk_size (int): Maximum number of keys per query. Defaults to 900.
+
+        Returns:
+            Set[bytes]: The hashes (see utils.uid_hash) of the keys that are already
+            stored in the database.
+        """
+        processed = set()
         cursor = conn.cursor()
-        cursor.execute("SELECT 1 FROM processed_emails WHERE uid = ?", (uid,))
-        return cursor.fetchone() is not None
+        for i in range(0, len(keys), chunk_size):
+            chunk = [uid_hash(key) for key in keys[i : i + chunk_size]]
+            placeholders = ",".join("?" * len(chunk))
+            cursor.execute(
+                f"SELECT uid_hash FROM processed_emails WHERE uid_hash IN ({placeholders})",
+                chunk,
+            )
+            processed.update(row[0] for row in cursor.fetchall())
+        return processed
+
+    @staticmethod
+    def load_processed_keys(conn: sqlite3.Connection) -> Set[bytes]:
+        """
+        Load the hashed keys of all processed emails into memory.
+
+        Only the hashes are loaded, which SQLite reads from the primary key index
+        without touching the rows.
+
+        Args:
+            conn (sqlite3.Connection): Connection object to the SQLite database.
+
+        Returns:
+            Set[bytes]: The hashes (see utils.uid_hash) of the keys of all emails
+            stored in the database.
+        """
+        cursor = conn.cursor()
+        cursor.execute("SELECT uid_hash FROM processed_emails")
+        return {row[0] for row in cursor.fetchall()}
+
+    @staticmethod
+    def scope_keys(conn: sqlite3.Connection, prefix: str) -> List[str]:
+        """
+        Moves emails stored under their bare IMAP UID to keys with the given prefix.
+
+        Older versions stored IMAP emails under their UID alone, which the server
+        reuses after a change of UIDVALIDITY. Emails with numeric keys are assumed to
+        be IMAP emails of the folder the prefix belongs to, so a database shared by
+        several IMAP folders assigns them all to the first folder that is processed.
+
+        Args:
+            conn (sqlite3.Connection): Connection object to the SQLite database.
+            prefix (str): The prefix of the new keys, see IMAPMailbox.mail_key.
+
+        Returns:
+            List[str]: The UIDs of the moved emails.
+        """
+        uids = [
+            row[0]
+            for row in conn.execute(
+                "SELECT uid FROM processed_emails"
+                " WHERE mail_key = uid AND uid NOT GLOB '*[^0-9]*'"
+            )
+        ]
+        rekeyed = [(uid_hash(prefix + uid), uid_hash(uid)) for uid in uids]
+        with conn:
+            conn.executemany(
+                "UPDATE attachments SET uid_hash = ? WHERE uid_hash = ?", rekeyed
+            )
+            conn.executemany(
+                "UPDATE processed_emails SET uid_hash = ?, mail_key = ? WHERE uid_hash = ?",
+                [
+                    (new_hash, prefix + uid, old_hash)
+                    for uid, (new_hash, old_hash) in zip(uids, rekeyed)
+                ],
+            )
+        return uids
 
 
 class AttachmentHandler(ABC):
     """
     Abstract class that defines the interface for attachment file handler
 
+    Attributes:
+        write_chunk_size (int): Number of bytes handed to the operating system per write call.
     """
 
+    write_chunk_size = 1 << 20
+
     def __init__(self, export_directory: str):
         self.export_directory = export_directory
-        if not os.path.exists(self.export_directory):
-            os.makedirs(self.export_directory)
-            logging.info(f"Created directory for attachments: {self.export_directory}")
-        else:
-            logging.debug(
-                f"Attachment directory already exists: {self.export_directory}"
-            )
+        os.makedirs(self.export_directory, exist_ok=True)
+        _LOG.debug("Attachment directory: %s", self.export_directory)
 
     def write_attachment(
         self, sender: str, subject: str, date: datetime, filename: str, payload
     ) -> str:
         """
         Writes attachment to some location in export_directory
+
+        The payload is either a bytes-like object or an iterable of bytes chunks,
+        which allows decoding large attachments while they are written.
+
         Returns: filepath
         """
-        fname = self.output_path(sender, subject, date, filename)
-        if os.path.exists(fname):
-            fname = increment_filename(fname)
+        path = self.output_path(sender, subject, date, filename)
+        flags = os.O_WRONLY | os.O_CREAT | os.O_EXCL | getattr(os, "O_BINARY", 0)
+        fname = path
+        # O_EXCL creates the file only if the name is free, so that emails processed
+        # in parallel never pick the same file name; on a collision the next free
+        # name is searched for and claimed the same way
+        while True:
+            try:
+                fd = os.open(fname, flags, 0o666)
+                break
+            except FileExistsError:
+                fname = increment_filename(path)
         try:
-            with open(fname, "wb") as fout:
-                fout.write(payload)
+            if isinstance(payload, (bytes, bytearray, memoryview)):
+                view = memoryview(payload)
+                payload = (
+                    view[i : i + self.write_chunk_size]
+                    for i in range(0, len(view), self.write_chunk_size)
+                )
+            self._write_chunks(fd, payload)
+            if hasattr(os, "posix_fadvise"):
+                # attachments are not read back, leave the page cache to the database
+                os.posix_fadvise(fd, 0, 0, os.POSIX_FADV_DONTNEED)
         except Exception as e:
-            logging.error("Could not save attachment with subject {subject}.")
+            _LOG.error("Could not save attachment with subject %s.", subject)
             raise e
+        finally:
+            os.close(fd)
         return fname
 
+    def _write_chunks(self, fd: int, chunks):
+        """
+        Writes the chunks to the file descriptor, gathering up to write_chunk_size bytes per system call.
+        """
+        buffers = []
+        size = 0
+        for chunk in chunks:
+            buffers.append(chunk)
+            size += len(chunk)
+            if size >= self.write_chunk_size or len(buffers) >= 512:
+                self._write_buffers(fd, buffers)
+                buffers = []
+                size = 0
+        if buffers:
+            self._write_buffers(fd, buffers)
+
+    def _write_buffers(self, fd: int, buffers: list):
+        written = os.writev(fd, buffers) if hasattr(os, "writev") else 0
+        # writev may write less than requested, the rest is written piece by piece
+        for buffer in buffers:
+            view = memoryview(buffer)
+            if written >= len(view):
+                written -= len(view)
+                continue
+            view = view[written:]
+            written = 0
+            while view:
+                view = view[os.write(fd, view) :]
+
     @abstractmethod
     def output_path(self, sender: str, subject: str, date: datetime, filename: str):
         """
@@ -174,16 +480,167 @@ class AttachmentHandler(ABC):
 
 
 class SimpleExporter(AttachmentHandler):
-    def __init__(self, export_directory: str):
-        super().__init__(export_directory)
-
     def output_path(self, sender: str, subject: str, date: datetime, filename: str):
         fname = filename
         fname = sanitize_filename(fname)
-        prefix = sanitize_filename(f"{subject}_{sender}_{date.isoformat()}")
-        out = os.path.join(self.export_directory, f"{prefix}_{fname}")
+        out = os.path.join(
+            self.export_directory,
+            f"{self.output_prefix(sender, subject, date)}_{fname}",
+        )
         return out
 
+    def output_prefix(self, sender: str, subject: str, date: datetime) -> str:
+        """
+        Returns the sanitized prefix shared by all attachments of an email.
+
+        The prefix is looked up in the cache of sanitize_filename, which also
+        serves emails whose attachments are written in parallel.
+        """
+        date_str = date.isoformat() if date else "Unknown"
+        return sanitize_filename(f"{subject}_{sender}_{date_str}")
+
+
+class DeduplicatingExporter(SimpleExporter):
+    """
+    SimpleExporter that keeps only one copy of identical attachments on disk.
+
+    Attachments are hashed while they are written. The first file with a given content
+    is linked into blobs/<xx>/<sha256> inside the export directory, later files with the
+    same content are replaced by hard links to it. Every email keeps its own file name.
+    """
+
+    def write_attachment(
+        self, sender: str, subject: str, date: datetime, filename: str, payload
+    ) -> str:
+        digest = hashlib.sha256()
+        if isinstance(payload, (bytes, bytearray, memoryview)):
+            digest.update(payload)
+        else:
+            payload = self._hash_chunks(payload, digest)
+        path = super().write_attachment(sender, subject, date, filename, payload)
+        self._link_blob(path, digest.hexdigest())
+        return path
+
+    @staticmethod
+    def _hash_chunks(chunks, digest):
+        for chunk in chunks:
+            digest.update(chunk)
+            yield chunk
+
+    def _link_blob(self, path: str, digest: str):
+        """
+        Links the written file into the blob store, or replaces it by the stored copy.
+        """
+        blob = os.path.join(self.export_directory, "blobs", digest[:2], digest)
+        try:
+            os.makedirs(os.path.dirname(blob), exist_ok=True)
+            os.link(path, blob)
+            return
+        except FileExistsError:
+            pass
+        except OSError as e:
+            # e.g. file systems without hard links, the file is simply kept
+            _LOG.debug("Could not add %s to the blob store: %s", path, e)
+            return
+        # the link is created under a temporary name and moved over the file,
+        # so that the file name stays taken for emails written in parallel
+        tmp_path = f"{path}.{threading.get_ident()}.tmp"
+        try:
+            os.link(blob, tmp_path)
+            os.replace(tmp_path, path)
+        except OSError as e:
+            _LOG.debug("Could not link %s to %s: %s", path, blob, e)
+            if os.path.lexists(tmp_path):
+                os.unlink(tmp_path)
+
+
+class CompressingIMAP4_SSL(imaplib.IMAP4_SSL):
+    """
+    IMAP4_SSL connection that can compress its traffic with COMPRESS=DEFLATE (RFC 4978).
+
+    imaplib has no support for the extension, so once it is enabled, everything
+    sent is deflated and everything read is inflated here.
+    """
+
+    _deflate = None
+    _inflate = None
+
+    def enable_compression(self) -> bool:
+        """
+        Asks the server to compress the connection.
+
+        Returns:
+            bool: Whether the connection is compressed from now on.
+        """
+        try:
+            result, _ = self.xatom("COMPRESS", "DEFLATE")
+        except imaplib.IMAP4.error as e:
+            _LOG.debug("COMPRESS=DEFLATE rejected: %s", e)
+            return False
+        if result != "OK":
+            return False
+        self._deflate = zlib.compressobj(6, zlib.DEFLATED, -15)
+        self._inflate = zlib.decompressobj(-15)
+        self._inflated = bytearray()
+        return True
+
+    def send(self, data: bytes):
+        if self._deflate is not None:
+            data = self._deflate.compress(data) + self._deflate.flush(zlib.Z_SYNC_FLUSH)
+        super().send(data)
+
+    def _fill(self):
+        data = self.file.read1(1 << 16)
+        if not data:
+            raise self.abort("socket error: EOF")
+        self._inflated += self._inflate.decompress(data)
+
+    def read(self, size: int) -> bytes:
+        if self._inflate is None:
+            return super().read(size)
+        while len(self._inflated) < size:
+            self._fill()
+        data = bytes(self._inflated[:size])
+        del self._inflated[:size]
+        return data
+
+    def readline(self) -> bytes:
+        if self._inflate is None:
+            return super().readline()
+        start = 0
+        while True:
+            end = self._inflated.find(b"\n", start) + 1
+            if end:
+                break
+            start = len(self._inflated)
+            if start > imaplib._MAXLINE:
+                raise self.error(f"got more than {imaplib._MAXLINE} bytes")
+            self._fill()
+        line = bytes(self._inflated[:end])
+        del self._inflated[:end]
+        return line
+
+
+class BodyPart(NamedTuple):
+    """
+    A non-multipart part of an email as described by the IMAP BODYSTRUCTURE.
+
+    Attributes:
+        section (str): The IMAP section number of the part, e.g. "1.2".
+        content_type (str): The content type, e.g. "text/plain".
+        encoding (str): The Content-Transfer-Encoding, e.g. "base64".
+        charset (Optional[str]): The charset of the part, if given.
+        disposition (Optional[str]): The Content-Disposition, e.g. "attachment".
+        filename (Optional[str]): The file name of the part, if given.
+    """
+
+    section: str
+    content_type: str
+    encoding: str
+    charset: Optional[str]
+    disposition: Optional[str]
+    filename: Optional[str]
+
 
 class Mailbox(ABC):
     """
@@ -191,29 +648,35 @@ class Mailbox(ABC):
 
     Attributes:
         attachment_dir (str): Directory where email attachments will be saved.
+        workers (int): Number of threads used to parse emails and write their attachments.
     """
 
+    # whether UIDs are increasing integers, so that search_emails can be restricted
+    # to emails newer than the last processed one
+    incremental_search = False
+    # identifies the numbering of the UIDs in the selected folder, if the mailbox has one
+    uid_validity = None
+
     def __init__(
         self,
         server: str,
         export_directory: str = "attachments",
         attachment_handler: AttachmentHandler = SimpleExporter,
+        workers: int = 1,
     ):
         """
         Initializes the Mailbox class with an attachment directory.
 
         Args:
             export_directory (str): Directory to save email attachments.
+            workers (int): Number of threads used to parse emails and write their attachments.
         """
         self.server = server
+        self.workers = workers
         self.delete_mails = False
         self.attachment_dir = export_directory
+        # the attachment handler creates the attachment directory
         self.attachment_handler = attachment_handler(self.attachment_dir)
-        if not os.path.exists(self.attachment_dir):
-            os.makedirs(self.attachment_dir)
-            logging.info(f"Created directory for attachments: {self.attachment_dir}")
-        else:
-            logging.debug(f"Attachment directory already exists: {self.attachment_dir}")
 
     @abstractmethod
     def connect(self, email_address: str, password: str):
@@ -237,14 +700,21 @@ class Mailbox(ABC):
         pass
 
     @abstractmethod
-    def search_emails(self, filters: Optional[Dict] = None) -> List[str]:
+    def search_emails(
+        self, filters: Optional[Dict] = None, since_uid: Optional[str] = None
+    ) -> List[str]:
         """
         Searches for emails in the selected folder.
 
+        Args:
+            filters (Optional[Dict]): Filters the emails have to match.
+            since_uid (Optional[str]): Only return emails with a UID greater than this one.
+                Only taken into account by mailboxes with incremental_search.
+
         Returns:
             List[str]: List of email UIDs found in the folder.
         """
-        logging.info("Search for email messages in the selected folder")
+        _LOG.info("Search for email messages in the selected folder")
         self._verified_filters = {
             "is_read": bool,
             "min_age_days": int,
@@ -254,8 +724,10 @@ class Mailbox(ABC):
         }
         for k, v in filters.items():
             if k not in self._verified_filters.keys():
-                logging.warning(
-                    f"A filter was provided that has not been tested! ({k}:{v}). It will not be considered!"
+                _LOG.warning(
+                    "A filter was provided that has not been tested! (%s:%s). It will not be considered!",
+                    k,
+                    v,
                 )
 
     @abstractmethod
@@ -271,6 +743,24 @@ class Mailbox(ABC):
         """
         pass
 
+    def get_mails(self, uids: List[str]) -> Iterator[Mail]:
+        """
+        Fetches the Mail objects for the given UIDs.
+
+        The default implementation calls get_mail for each UID. Mailboxes that can
+        fetch several mails per request should override this.
+
+        Args:
+            uids (List[str]): The UIDs of the emails to fetch.
+
+        Returns:
+            Iterator[Mail]: Mail objects for all UIDs that could be fetched.
+        """
+        for uid in uids:
+            mail = self.get_mail(uid)
+            if mail:
+                yield mail
+
     @abstractmethod
     def trash_mail(self, uid: str) -> None:
         """
@@ -279,7 +769,71 @@ class Mailbox(ABC):
         Args:
             uid (str): The UID of the email to trash.
         """
-        logging.info(f"Moving mail {uid} to trash")
+        _LOG.info("Moving mail %s to trash", uid)
+
+    def mark_processed(self, uids: List[str]):
+        """
+        Marks the emails as read once their metadata has been saved.
+
+        Mailboxes that mark the emails as read while fetching them do nothing here.
+
+        Args:
+            uids (List[str]): The UIDs of the saved emails.
+        """
+        pass
+
+    def mail_key(self, uid: str, uid_validity: Optional[str] = None) -> str:
+        """
+        Returns the key under which an email of the selected folder is stored in the database.
+
+        Mailboxes whose UIDs are only unique within a folder and its UIDVALIDITY
+        include both in the key, otherwise it is the UID itself.
+
+        Args:
+            uid (str): The UID of the email.
+            uid_validity (Optional[str]): The UIDVALIDITY the UID belongs to. Defaults to
+                the current one of the selected folder.
+
+        Returns:
+            str: The key of the email.
+        """
+        return uid
+
+    def existing_uids(self, uids: List[str]) -> Set[str]:
+        """
+        Determines which of the given emails still exist in the selected folder.
+
+        Used to tell emails that were deleted since the search from emails that
+        failed to be fetched. Mailboxes that cannot tell assume all of them exist.
+
+        Args:
+            uids (List[str]): The UIDs to check.
+
+        Returns:
+            Set[str]: The UIDs of the emails that still exist.
+        """
+        return set(uids)
+
+    def forget_unprocessed(self):
+        """
+        Drops what was kept about fetched emails for mark_processed.
+
+        Called at the end of every download, also an aborted one, so that emails
+        which were fetched but never saved do not pile up across poll cycles.
+        """
+        pass
+
+    def noop(self):
+        """
+        Keeps the connection to the mailbox server alive between poll cycles.
+        """
+        pass
+
+    def expunge(self):
+        """
+        Permanently removes mails that were moved to trash, if the mailbox needs an explicit step for it.
+        """
+        pass
 
     @abstractmethod
     def close(self):
@@ -298,14 +852,45 @@ class IMAPMailbox(Mailbox):
         server (str): IMAP server address.
         port (int): IMAP server port.
         connection (imaplib.IMAP4_SSL): IMAP connection object.
+        fetch_batch_size (int): Maximum number of emails requested with a single FETCH command.
+        partial_fetch (bool): Whether only the needed sections of the emails are fetched.
+        connections (int): Number of connections used to fetch emails in parallel.
+        skip_body_without_attachments (bool): Whether the body of emails without attachments is left out.
+        store_body (bool): Whether the body of emails is stored at all.
+        compress (bool): Whether the connections are compressed with COMPRESS=DEFLATE, if the server supports it.
     """
 
+    _fetch_uid_pattern = re.compile(rb"UID (\d+)")
+    _fetch_token_pattern = re.compile(
+        rb'\s*(?:(\()|(\))|"((?:[^"\\]|\\.)*)"|\{(\d+)\}$|([^\s()"]+))'
+    )
+    incremental_search = True
+    _base64_junk_pattern = re.compile(rb"[^A-Za-z0-9+/]")
+    # Content-Transfer-Encodings of attachments that are decoded while writing them
+    _streamed_encodings = {"base64", "quoted-printable", "7bit", "8bit", "binary", ""}
+    decode_chunk_size = 1 << 16
+    # date filter -> IMAP search key and how several cutoffs for the same key are
+    # combined: the earliest BEFORE and the latest SINCE date are the restrictive ones
+    _date_filters = {
+        "min_age_days": ("BEFORE", min),
+        "before": ("BEFORE", min),
+        "max_age_days": ("SINCE", max),
+        "after": ("SINCE", max),
+    }
+
     def __init__(
         self,
         server: str,
         export_directory: str = "attachments",
         attachment_handler: AttachmentHandler = SimpleExporter,
         port: int = 993,
+        fetch_batch_size: int = 100,
+        workers: int = 1,
+        partial_fetch: bool = False,
+        connections: int = 1,
+        skip_body_without_attachments: bool = False,
+        store_body: bool = True,
+        compress: bool = False,
     ):
         """
         Initializes the IMAPMailbox class.
@@ -314,11 +899,34 @@ class IMAPMailbox(Mailbox):
             export_directory (str): Directory where email attachments will be saved.
             server (str): IMAP server address.
             port (int): IMAP server port.
+            fetch_batch_size (int): Maximum number of emails requested with a single FETCH command.
+            workers (int): Number of threads used to parse the fetched emails and write their attachments.
+            partial_fetch (bool): Only fetch the headers, the text body and the attachments instead of the complete emails.
+            connections (int): Number of connections used to fetch batches of emails in parallel. With more
+                than one, they are opened next to the main connection. Servers limit the connections per
+                account (e.g. Gmail to 15), so keep this small.
+            skip_body_without_attachments (bool): Neither decode nor store the body of emails without
+                attachments. With partial_fetch, their body is not downloaded either.
+            store_body (bool): Decode and store the body of emails. Without it, only the metadata and the
+                attachments are kept, and with partial_fetch no body is downloaded at all.
+            compress (bool): Compress the traffic of all connections with COMPRESS=DEFLATE (RFC 4978)
+                if the server supports it. Saves bandwidth on text heavy emails at the cost of CPU time.
         """
-        super().__init__(server, export_directory, attachment_handler)
+        super().__init__(server, export_directory, attachment_handler, workers)
         self.port = port
+        self.fetch_batch_size = fetch_batch_size
+        self.partial_fetch = partial_fetch
+        self.connections = connections
+        self.skip_body_without_attachments = skip_body_without_attachments
+        self.store_body = store_body
+        self.compress = compress
         self.connection = None
-        logging.debug(f"Using IMAP server: {self.server} on port {self.port}")
+        self._credentials = None
+        self._fetch_connections = []
+        self._folder = None
+        self._attachment_executor = None
+        self._attachment_executor_lock = threading.Lock()
+        _LOG.debug("Using IMAP server: %s on port %s", self.server, self.port)
 
     def connect(self, email_address: str, password: str):
         """
@@ -331,73 +939,128 @@ class IMAPMailbox(Mailbox):
         Raises:
             SystemExit: If the authentication fails due to invalid credentials.
         """
-        logging.info("Connecting to the IMAP email server...")
+        _LOG.info("Connecting to the IMAP email server...")
+        self._credentials = (email_address, password)
         try:
-            self.connection = imaplib.IMAP4_SSL(self.server, self.port)
-            self.connection.login(email_address, password)
-            logging.info(f"Connected successfully to {self.server}")
+            self.connection = self._login()
+            _LOG.info("Connected successfully to %s", self.server)
         except imaplib.IMAP4.error as e:
-            logging.error(f"Authentication failed: {e}")
+            _LOG.error("Authentication failed: %s", e)
             raise SystemExit(
                 "Invalid credentials. Please check your email and password."
             )
 
+    def _login(self) -> imaplib.IMAP4_SSL:
+        connection = CompressingIMAP4_SSL(self.server, self.port)
+        connection.login(*self._credentials)
+        if self.compress and not connection.enable_compression():
+            _LOG.info("The server does not support COMPRESS=DEFLATE.")
+        return connection
+
+    def _open_fetch_connections(self) -> List[imaplib.IMAP4_SSL]:
+        """
+        Opens the additional connections used to fetch emails in parallel, if not done yet.
+
+        Returns:
+            List[imaplib.IMAP4_SSL]: The fetch connections, with the current folder selected.
+        """
+        while len(self._fetch_connections) < self.connections:
+            _LOG.info("Opening an additional connection for fetching emails...")
+            connection = self._login()
+            self._fetch_connections.append(connection)
+            self._select(connection, self._folder)
+        return self._fetch_connections
+
+    def _select(self, connection: imaplib.IMAP4, folder: str):
+        result, _ = connection.select(folder)
+        if result != "OK":
+            _LOG.error("Failed to select folder %s.", folder)
+            raise Exception(f"Failed to select folder {folder}.")
+
     def select_folder(self, folder: str, public: bool):
         """
         Selects a folder in the IMAP mailbox.
 
+        The connection is kept open across poll cycles, so a folder that is already
+        selected is not selected again. A NOOP is enough to see new emails in it.
+
         Args:
             folder (str): Name of the folder to select (e.g., "inbox").
 
         Raises:
             Exception: If the folder cannot be selected.
         """
-        logging.info(f"Selecting mailbox folder: {folder}")
-        result, _ = self.connection.select(folder)
-        if result != "OK":
-            logging.error(f"Failed to select folder {folder}.")
-            raise Exception(f"Failed to select folder {folder}.")
-
-    def search_emails(self, filters: Optional[Dict] = None) -> List[str]:
+        if folder == self._folder:
+            _LOG.debug("Mailbox folder %s is already selected.", folder)
+            # also keeps idle fetch connections alive between poll cycles
+            for connection in self._fetch_connections:
+                connection.noop()
+            # the server announces a renumbering of the selected folder unsolicited
+            _, data = self.connection.response("UIDVALIDITY")
+            if data and data[0]:
+                self.uid_validity = data[0].decode()
+            return
+        _LOG.info("Selecting mailbox folder: %s", folder)
+        self._select(self.connection, folder)
+        # also keeps idle fetch connections alive between poll cycles
+        for connection in self._fetch_connections:
+            self._select(connection, folder)
+        self._folder = folder
+        _, data = self.connection.response("UIDVALIDITY")
+        self.uid_validity = data[0].decode() if data and data[0] else None
+
+    def search_emails(
+        self, filters: Optional[Dict] = None, since_uid: Optional[str] = None
+    ) -> List[str]:
         """
         Searches for all emails in the selected folder.
 
+        Args:
+            filters (Optional[Dict]): Filters the emails have to match.
+            since_uid (Optional[str]): Only return emails with a UID greater than this one.
+
         Returns:
             List[str]: List of email UIDs found in the folder.
         """
         super().search_emails(filters)
-        query = "ALL"
+        query = []
         if filters is not None:
-            query = []
             if "is_read" in filters:
                 if bool(filters["is_read"]):
                     query.append("SEEN")
                 else:
                     query.append("UNSEEN")
 
-            for before_filter in ["min_age_days", "before"]:
-                if before_filter in filters:
-                    cutoff_date = CutOffDate(filters[before_filter])
-                    logging.info(f"Looking for mails before {cutoff_date}")
-                    query.append(f"BEFORE {cutoff_date}")
-            
-            for after_filter in ["max_age_days", "after"]:
-                if after_filter in filters:
-                    cutoff_date = CutOffDate(filters[after_filter])
-                    logging.info(f"Looking for mails after {cutoff_date}")
-                    query.append(f"AFTER {cutoff_date}")
-
+            cutoffs = {}
+            for date_filter, (search_key, combine) in self._date_filters.items():
+                if date_filter in filters:
+                    cutoff_date = CutOffDate(filters[date_filter])
+                    cutoffs[search_key] = combine(
+                        cutoffs.get(search_key, cutoff_date),
+                        cutoff_date,
+                        key=lambda cutoff: cutoff.datetime,
+                    )
+            for search_key, cutoff_date in cutoffs.items():
+                _LOG.info("Looking for mails %s %s", search_key.lower(), cutoff_date)
+                query.append(f"{search_key} {cutoff_date}")
+
+        if since_uid is not None:
+            _LOG.info("Looking for mails with UID greater than %s", since_uid)
+            query.append(f"UID {int(since_uid) + 1}:*")
 
         if len(query) == 0:
             query = ["ALL"]
 
         result, data = self.connection.uid("search", None, " ".join(query))
         if result != "OK":
-            logging.error("Failed to search for emails.")
+            _LOG.error("Failed to search for emails.")
             return []
-        uids = data[0].split()
-        logging.info(f"Found {len(uids)} emails.")
-        return [uid.decode() for uid in uids]
+        uids = [uid.decode() for uid in data[0].split()]
+        if since_uid is not None:
+            # "n:*" always matches the newest email, even if its UID is below n
+            uids = [uid for uid in uids if int(uid) > int(since_uid)]
+        _LOG.info("Found %s emails.", len(uids))
+        return uids
 
     def get_mail(self, uid: str) -> Optional[Mail]:
         """
@@ -409,141 +1072,828 @@ class IMAPMailbox(Mailbox):
         Returns:
             Optional[Mail]: A Mail object containing the email's details if found, None otherwise.
         """
-        logging.info(f"Fetching email with UID: {uid}")
+        _LOG.info("Fetching email with UID: %s", uid)
         result, data = self.connection.uid("fetch", uid, "(RFC822)")
         if result != "OK":
-            logging.warning(f"Failed to fetch email with UID: {uid}. Skipping.")
+            _LOG.warning("Failed to fetch email with UID: %s. Skipping.", uid)
             return None
 
         for response_part in data:
             if isinstance(response_part, tuple):
-                msg = email.message_from_bytes(response_part[1])
-
-                subject = self.decode_header_value(msg["subject"])
-                sender = msg.get("From")
-                recipient = msg.get("To")
-                date_str = msg.get("Date")
-                date = self.parse_email_date(date_str)
-                body = self.get_email_body(msg)
-                attachments = self.get_attachments(msg, uid, subject, sender, date)
-
-                return Mail(
-                    uid=uid,
-                    subject=subject,
-                    sender=sender,
-                    recipient=recipient,
-                    date=date.isoformat(),
-                    body=body,
-                    attachments=attachments,
+                return self.build_mail(uid, response_part[1])
+
+    def get_mails(self, uids: List[str]) -> Iterator[Mail]:
+        """
+        Fetches emails by their UIDs, requesting up to fetch_batch_size emails per FETCH command.
+
+        If the server rejects a FETCH command, e.g. because the request is too large,
+        the batch size is halved and the batch is requested again. With more than one
+        connection, the batches are fetched and processed in parallel on separate connections.
+        Otherwise the next batch is fetched while the current one is processed.
+
+        Args:
+            uids (List[str]): The UIDs of the emails to fetch.
+
+        Returns:
+            Iterator[Mail]: Mail objects for all UIDs that could be fetched.
+        """
+        batches = self._iter_batches(uids)
+        if self.connections > 1 and len(uids) > self.fetch_batch_size:
+            yield from self._get_mails_parallel(batches)
+            return
+
+        # parsing and writing attachments does not touch the connection, so the
+        # fetched emails of a batch are processed in parallel, on one pool for all batches
+        executor = (
+            ThreadPoolExecutor(max_workers=self.workers) if self.workers > 1 else None
+        )
+        try:
+            for fetched in self._iter_fetched(batches):
+                if executor is not None:
+                    mails = list(executor.map(self._build_fetched, fetched))
+                else:
+                    mails = (self._build_fetched(item) for item in fetched)
+                for mail in mails:
+                    if mail:
+                        yield mail
+        finally:
+            if executor is not None:
+                executor.shutdown()
+
+    def _iter_fetched(self, batches: Iterator[List[str]]) -> Iterator[List[tuple]]:
+        """
+        Fetches the batches on the main connection, one batch ahead of the caller.
+
+        While the caller parses a batch and saves it to the database, the next FETCH
+        is already running in the background. When emails are deleted, the caller
+        trashes them on the main connection between batches, so nothing is fetched
+        ahead then.
+        """
+        if self.delete_mails:
+            for batch in batches:
+                yield self._fetch_batch(self.connection, batch)
+            return
+
+        with ThreadPoolExecutor(max_workers=1, thread_name_prefix="fetch") as fetcher:
+            current = None
+            for batch in batches:
+                upcoming = fetcher.submit(self._fetch_batch, self.connection, batch)
+                if current is not None:
+                    yield current.result()
+                current = upcoming
+            if current is not None:
+                yield current.result()
+
+    def _get_mails_parallel(self, batches: Iterator[List[str]]) -> Iterator[Mail]:
+        """
+        Fetches and processes the batches on the additional fetch connections.
+
+        The main connection stays free for the caller (e.g. to trash saved emails), and
+        the emails are yielded in the order of the batches, so that the caller stays the
+        only one writing to the database.
+        """
+        connections = queue.Queue()
+        for connection in self._open_fetch_connections():
+            connections.put(connection)
+
+        def fetch_and_build(batch: List[str]) -> List[Optional[Mail]]:
+            connection = connections.get()
+            try:
+                fetched = self._fetch_batch(connection, batch)
+            finally:
+                connections.put(connection)
+            return [self._build_fetched(item) for item in fetched]
+
+        with ThreadPoolExecutor(max_workers=self.connections) as executor:
+            # only a few batches run ahead of the caller, to bound the memory use
+            pending = collections.deque()
+            for batch in batches:
+                pending.append(executor.submit(fetch_and_build, batch))
+                if len(pending) > self.connections:
+                    yield from filter(None, pending.popleft().result())
+            while pending:
+                yield from filter(None, pending.popleft().result())
+
+    def _iter_batches(self, uids: List[str]) -> Iterator[List[str]]:
+        # the batch size is read for every batch, as _fetch_batch may have reduced it
+        i = 0
+        while i < len(uids):
+            batch = uids[i : i + self.fetch_batch_size]
+            i += len(batch)
+            yield batch
+
+    def _fetch_batch(self, connection: imaplib.IMAP4, batch: List[str]) -> List[tuple]:
+        """
+        Fetches a batch of emails, splitting it up if the server rejects the request.
+
+        Args:
+            connection (imaplib.IMAP4): The connection used for the FETCH commands.
+            batch (List[str]): The UIDs of the emails to fetch.
+
+        Returns:
+            List[tuple]: The fetched emails, as arguments for _build_fetched.
+        """
+        _LOG.info(
+            "Fetching %s emails with UIDs: %s..%s", len(batch), batch[0], batch[-1]
+        )
+        fetch = self._fetch_parts if self.partial_fetch else self._fetch_messages
+        try:
+            fetched = fetch(connection, batch)
+        except imaplib.IMAP4.abort:
+            raise
+        except imaplib.IMAP4.error as e:
+            if len(batch) == 1:
+                raise
+            half = len(batch) // 2
+            self.fetch_batch_size = min(self.fetch_batch_size, half)
+            _LOG.warning(
+                "Fetching %s emails failed (%s). Retrying with batches of %s.",
+                len(batch),
+                e,
+                half,
+            )
+            return self._fetch_batch(connection, batch[:half]) + self._fetch_batch(
+                connection, batch[half:]
+            )
+        if fetched is None:
+            _LOG.warning("Failed to fetch emails with UIDs: %s. Skipping.", batch)
+            return []
+        return fetched
+
+    def _build_fetched(self, item: tuple) -> Optional[Mail]:
+        if self.partial_fetch:
+            return self._build_partial_mail(*item)
+        return self._build_mail(*item)
+
+    def _fetch_messages(
+        self, connection: imaplib.IMAP4, uids: List[str]
+    ) -> Optional[List[tuple]]:
+        """
+        Fetches the complete RFC822 messages for the given UIDs.
+
+        Args:
+            connection (imaplib.IMAP4): The connection used for the FETCH command.
+            uids (List[str]): The UIDs of the emails to fetch.
+
+        Returns:
+            Optional[List[tuple]]: (uid, raw_email) pairs, or None if the FETCH command failed.
+        """
+        result, data = connection.uid("fetch", ",".join(uids), "(RFC822)")
+        if result != "OK":
+            return None
+        return list(self._iter_fetch_response(data))
+
+    def _fetch_parts(
+        self, connection: imaplib.IMAP4, uids: List[str]
+    ) -> Optional[List[tuple]]:
+        """
+        Fetches only the headers, the text body and the attachments of the given UIDs.
+
+        The BODYSTRUCTURE of each email is requested together with its headers, so that
+        the sections holding the text body and the attachments can be requested with a
+        second FETCH. Emails that need the same sections share a single FETCH command.
+        All other parts (e.g. the HTML alternative or inline images) are never downloaded.
+
+        Args:
+            connection (imaplib.IMAP4): The connection used for the FETCH commands.
+            uids (List[str]): The UIDs of the emails to fetch.
+
+        Returns:
+            Optional[List[tuple]]: (uid, header, body_part, attachment_parts, payloads) tuples,
+                or None if the FETCH command failed.
+        """
+        result, data = connection.uid(
+            "fetch", ",".join(uids), "(UID BODYSTRUCTURE BODY.PEEK[HEADER])"
+        )
+        if result != "OK":
+            return None
+
+        messages = {}
+        for response in self._parse_fetch_response(data):
+            uid = response.get("UID")
+            structure = response.get("BODYSTRUCTURE")
+            header = response.get("BODY[HEADER]")
+            if uid is None or not isinstance(structure, list) or header is None:
+                _LOG.warning("Incomplete FETCH response: %s", list(response))
+                continue
+            parts = self._parse_bodystructure(structure)
+            if isinstance(structure[0], list):
+                # the text/plain part, or the HTML part if there is none
+                inline_parts = [part for part in parts if part.disposition is None]
+                body_part = next(
+                    (
+                        part
+                        for content_type in ["text/plain", "text/html"]
+                        for part in inline_parts
+                        if part.content_type == content_type
+                    ),
+                    None,
+                )
+            elif parts[0].content_type.startswith("text/"):
+                # a single part email is its own body, unless it is e.g. a bare PDF
+                body_part = parts[0]
+            else:
+                body_part = None
+            attachment_parts = [
+                part for part in parts if part.disposition is not None and part.filename
+            ]
+            messages[uid.decode()] = (header, body_part, attachment_parts)
+
+        sections_by_uid = {}
+        for uid, (_, body_part, attachment_parts) in messages.items():
+            sections = {part.section for part in attachment_parts}
+            if body_part is not None and self._wants_body(bool(attachment_parts)):
+                sections.add(body_part.section)
+            if sections:
+                sections_by_uid.setdefault(tuple(sorted(sections)), []).append(uid)
+
+        payloads = {uid: {} for uid in messages}
+        for sections, section_uids in sections_by_uid.items():
+            items = " ".join(f"BODY.PEEK[{section}]" for section in sections)
+            result, data = connection.uid(
+                "fetch", ",".join(section_uids), f"(UID {items})"
+            )
+            if result != "OK":
+                _LOG.warning(
+                    "Failed to fetch parts of emails with UIDs: %s. Skipping.",
+                    section_uids,
                 )
+                for uid in section_uids:
+                    del messages[uid]
+                continue
+            for response in self._parse_fetch_response(data):
+                uid = response.get("UID")
+                if uid is None or uid.decode() not in payloads:
+                    continue
+                for section in sections:
+                    payloads[uid.decode()][section] = response.get(f"BODY[{section}]")
+
+        if messages:
+            # BODY.PEEK does not set the \Seen flag, unlike fetching the RFC822 message
+            connection.uid("store", ",".join(messages), "+FLAGS", "(\\Seen)")
+        return [(uid, *message, payloads[uid]) for uid, message in messages.items()]
+
+    def _build_mail(self, uid: str, raw_email: bytes) -> Optional[Mail]:
+        try:
+            return self.build_mail(uid, raw_email)
+        except Exception as e:
+            _LOG.error("Error while processing email (UID %s)", uid)
+            raise e
+
+    def _build_partial_mail(self, uid: str, *args) -> Optional[Mail]:
+        try:
+            return self.build_partial_mail(uid, *args)
+        except Exception as e:
+            _LOG.error("Error while processing email (UID %s)", uid)
+            raise e
+
+    def _tokenize_fetch_response(self, data: list) -> Iterator:
+        """
+        Splits the data returned by imaplib for a FETCH command into tokens.
+
+        Yields "(" and ")" for parentheses, None for NIL and bytes for atoms,
+        quoted strings and literals.
+        """
+        for element in data:
+            if isinstance(element, tuple):
+                text, literal = element
+            elif isinstance(element, bytes):
+                text, literal = element, None
+            else:
+                continue
+            for match in self._fetch_token_pattern.finditer(text):
+                opening, closing, quoted, literal_size, atom = match.groups()
+                if opening:
+                    yield "("
+                elif closing:
+                    yield ")"
+                elif quoted is not None:
+                    yield re.sub(rb"\\(.)", rb"\1", quoted)
+                elif literal_size is not None:
+                    yield literal
+                elif atom.upper() == b"NIL":
+                    yield None
+                else:
+                    yield atom
+
+    def _parse_fetch_response(self, data: list) -> Iterator[Dict[str, object]]:
+        """
+        Parses the data returned by imaplib for a FETCH command.
+
+        Args:
+            data (list): The data returned by imaplib for a FETCH command.
+
+        Returns:
+            Iterator[Dict[str, object]]: The data items of each message, e.g. {"UID": b"42", "BODYSTRUCTURE": [...]}.
+                Parenthesized lists are returned as nested lists.
+        """
+        stack = []
+        for token in self._tokenize_fetch_response(data):
+            if token == "(":
+                stack.append([])
+            elif token == ")":
+                if not stack:
+                    continue
+                item = stack.pop()
+                if stack:
+                    stack[-1].append(item)
+                else:
+                    yield {
+                        key.decode().upper(): value
+                        for key, value in zip(item[::2], item[1::2])
+                        if isinstance(key, bytes)
+                    }
+            elif stack:
+                # the message sequence number in front of the data items is ignored
+                stack[-1].append(token)
+
+    def _parse_bodystructure(
+        self, structure: list, section: str = ""
+    ) -> List[BodyPart]:
+        """
+        Flattens a parsed BODYSTRUCTURE into its non-multipart parts.
+
+        Args:
+            structure (list): The BODYSTRUCTURE as returned by _parse_fetch_response.
+            section (str): The section number of the structure.
+
+        Returns:
+            List[BodyPart]: The parts in the order they appear in the email.
+        """
+        if isinstance(structure[0], list):
+            parts = []
+            children = itertools.takewhile(lambda c: isinstance(c, list), structure)
+            for i, child in enumerate(children, start=1):
+                child_section = f"{section}.{i}" if section else str(i)
+                parts.extend(self._parse_bodystructure(child, child_section))
+            return parts
+
+        def to_str(value) -> str:
+            return value.decode(errors="replace") if isinstance(value, bytes) else ""
+
+        def to_params(value) -> Dict[str, str]:
+            if not isinstance(value, list):
+                return {}
+            return {
+                to_str(key).lower(): to_str(value)
+                for key, value in zip(value[::2], value[1::2])
+            }
+
+        def get_filename(params: Dict[str, str]) -> Optional[str]:
+            for key in ["filename", "name"]:
+                if params.get(key):
+                    return params[key]
+                if params.get(f"{key}*"):
+                    return email.utils.collapse_rfc2231_value(
+                        email.utils.decode_rfc2231(params[f"{key}*"])
+                    )
+            return None
+
+        content_type = f"{to_str(structure[0])}/{to_str(structure[1])}".lower()
+        params = to_params(structure[2])
+        encoding = to_str(structure[5]).lower() if len(structure) > 5 else ""
+        # the extension data starts after the type specific fields
+        if content_type.startswith("text/"):
+            extension = 8
+        elif content_type == "message/rfc822":
+            extension = 10
+        else:
+            extension = 7
+        disposition = None
+        disposition_params = {}
+        if len(structure) > extension + 1 and isinstance(
+            structure[extension + 1], list
+        ):
+            disposition = to_str(structure[extension + 1][0]).lower()
+            if len(structure[extension + 1]) > 1:
+                disposition_params = to_params(structure[extension + 1][1])
+
+        return [
+            BodyPart(
+                section=section or "1",
+                content_type=content_type,
+                encoding=encoding,
+                charset=params.get("charset"),
+                disposition=disposition,
+                filename=get_filename(disposition_params) or get_filename(params),
+            )
+        ]
+
+    def _iter_fetch_response(self, data: list) -> Iterator[tuple]:
+        """
+        Pairs the messages of a multi-message FETCH response with their UIDs.
+
+        imaplib returns every message as a (prefix, literal) tuple followed by the
+        rest of the response line. The UID is usually part of the prefix, but
+        servers may also send it after the literal.
+
+        Args:
+            data (list): The data returned by imaplib for a FETCH command.
+
+        Returns:
+            Iterator[tuple]: (uid, raw_email) pairs.
+        """
+        for i, response_part in enumerate(data):
+            if not isinstance(response_part, tuple):
+                continue
+            match = self._fetch_uid_pattern.search(response_part[0])
+            if not match and i + 1 < len(data) and isinstance(data[i + 1], bytes):
+                match = self._fetch_uid_pattern.search(data[i + 1])
+            if not match:
+                _LOG.warning(
+                    "Could not determine UID of fetched message: %s", response_part[0]
+                )
+                continue
+            yield match.group(1).decode(), response_part[1]
+
+    def build_mail(self, uid: str, raw_email: bytes) -> Optional[Mail]:
+        """
+        Parses a raw RFC822 message, saves its attachments and returns it as Mail object.
+
+        Args:
+            uid (str): The UID of the email.
+            raw_email (bytes): The raw RFC822 message.
+
+        Returns:
+            Optional[Mail]: A Mail object containing the email's details.
+        """
+        msg = _PARSER.parsebytes(raw_email)
+
+        subject = self.decode_header_value(msg["subject"])
+        sender = msg.get("From")
+        recipient = msg.get("To")
+        date_str = msg.get("Date")
+        date = self.parse_email_date(date_str)
+        body, attachments = self.get_body_and_attachments(
+            msg, uid, subject, sender, date
+        )
+
+        return Mail(
+            uid=uid,
+            subject=subject,
+            sender=sender,
+            recipient=recipient,
+            date=date.isoformat() if date else "Unknown",
+            body=body,
+            attachments=attachments,
+            key=self.mail_key(uid),
+        )
+
+    def build_partial_mail(
+        self,
+        uid: str,
+        header: bytes,
+        body_part: Optional[BodyPart],
+        attachment_parts: List[BodyPart],
+        payloads: Dict[str, bytes],
+    ) -> Optional[Mail]:
+        """
+        Builds a Mail object from the separately fetched sections of an email and saves its attachments.
+
+        Args:
+            uid (str): The UID of the email.
+            header (bytes): The raw header of the email.
+            body_part (Optional[BodyPart]): The part holding the text body.
+            attachment_parts (List[BodyPart]): The parts holding the attachments.
+            payloads (Dict[str, bytes]): The raw content of the fetched sections.
+
+        Returns:
+            Optional[Mail]: A Mail object containing the email's details.
+        """
+        msg = _HEADER_PARSER.parsebytes(header)
+
+        subject = self.decode_header_value(msg["subject"])
+        sender = msg.get("From")
+        recipient = msg.get("To")
+        date_str = msg.get("Date")
+        date = self.parse_email_date(date_str)
+
+        body = ""
+        if body_part is not None and payloads.get(body_part.section) is not None:
+            body = _decode_text(
+                self.decode_payload(payloads[body_part.section], body_part.encoding),
+                body_part.charset,
+            )
+            if body_part.content_type == "text/html":
+                body = html_to_text(body)
+
+        saves = []
+        for part in attachment_parts:
+            if payloads.get(part.section) is None:
+                _LOG.warning(
+                    "Attachment %s of email %s could not be fetched.",
+                    part.filename,
+                    uid,
+                )
+                continue
+            saves.append(
+                functools.partial(
+                    self.attachment_handler.write_attachment,
+                    sender,
+                    subject,
+                    date,
+                    sanitize_filename(self.decode_header_value(part.filename)),
+                    self.iter_decoded_payload(payloads[part.section], part.encoding),
+                )
+            )
+        attachments = self._save_attachments(saves)
+        for output_path in attachments:
+            _LOG.info("Attachment saved to %s", output_path)
+
+        return Mail(
+            uid=uid,
+            subject=subject,
+            sender=sender,
+            recipient=recipient,
+            date=date.isoformat() if date else "Unknown",
+            body=body,
+            attachments=attachments,
+            key=self.mail_key(uid),
+        )
+
+    def decode_payload(self, payload: bytes, encoding: str) -> bytes:
+        """
+        Decodes the content of a body part according to its Content-Transfer-Encoding.
+
+        Args:
+            payload (bytes): The raw content of the body part.
+            encoding (str): The Content-Transfer-Encoding of the body part.
+
+        Returns:
+            bytes: The decoded content.
+        """
+        if encoding == "base64":
+            return base64.b64decode(payload)
+        if encoding == "quoted-printable":
+            return quopri.decodestring(payload)
+        return payload
+
+    def iter_decoded_payload(self, payload, encoding: str) -> Iterator[bytes]:
+        """
+        Decodes the content of a body part chunk by chunk.
+
+        Unlike decode_payload, at most decode_chunk_size bytes of the content are
+        decoded at once, so that large attachments are never held in memory twice.
+
+        Args:
+            payload (Union[str, bytes]): The raw content of the body part.
+            encoding (str): The Content-Transfer-Encoding of the body part.
+
+        Returns:
+            Iterator[bytes]: The decoded content in chunks.
+        """
+        chunks = self._iter_payload_chunks(payload)
+        if encoding == "base64":
+            rest = b""
+            for chunk in chunks:
+                data = rest + self._base64_junk_pattern.sub(b"", chunk)
+                end = len(data) - len(data) % 4
+                rest = data[end:]
+                if end:
+                    yield binascii.a2b_base64(data[:end])
+            # tolerate missing padding at the end, like email.message does
+            if len(rest) > 1:
+                yield binascii.a2b_base64(rest + b"=" * (-len(rest) % 4))
+        elif encoding == "quoted-printable":
+            rest = b""
+            for chunk in chunks:
+                # soft line breaks never span lines, so complete lines decode independently
+                data = rest + chunk
+                end = data.rfind(b"\n") + 1
+                rest = data[end:]
+                if end:
+                    yield quopri.decodestring(data[:end])
+            if rest:
+                yield quopri.decodestring(rest)
+        else:
+            yield from chunks
+
+    def _iter_payload_chunks(self, payload) -> Iterator[bytes]:
+        for i in range(0, len(payload), self.decode_chunk_size):
+            chunk = payload[i : i + self.decode_chunk_size]
+            if isinstance(chunk, str):
+                # same conversion as email.message.Message.get_payload
+                try:
+                    chunk = chunk.encode("ascii", "surrogateescape")
+                except UnicodeError:
+                    chunk = chunk.encode("raw-unicode-escape")
+            yield chunk
 
     def decode_header_value(self, value: str) -> str:
         """
         Decodes the header value from its encoded form to a readable string.
 
+        All encoded words of the value are decoded, undecodable bytes are replaced.
+        Values without encoded words are returned as they are. The other results are
+        cached, as subjects and file names repeat across emails.
+
         Args:
             value (str): The encoded header value.
 
         Returns:
             str: The decoded header value.
         """
-        logging.debug(f"Decoding header value: {value}")
+        _LOG.debug("Decoding header value: %s", value)
         if value is None:
             return "Unknown"
-        decoded_value, encoding = decode_header(value)[0]
-        if isinstance(decoded_value, bytes):
-            return decoded_value.decode(encoding or "utf-8")
-        return decoded_value
+        if isinstance(value, str):
+            if "=?" not in value:
+                # no RFC 2047 encoded words, nothing to decode
+                return value
+            return _decode_header_cached(value)
+        # headers with raw 8-bit data are returned as (unhashable) Header objects
+        return _join_decoded_header(value)
 
     def parse_email_date(self, date_str: str) -> datetime:
         """
-        Parses the email's date string into an ISO 8601 format.
+        Parses the email's RFC 5322 date string.
 
         Args:
             date_str (str): The date string from the email.
 
         Returns:
-            str: The parsed date in ISO 8601 format, or "Unknown" if parsing fails.
+            datetime: The parsed date, or None if parsing fails.
         """
-        for date_format in ["%a, %d %b %Y %H:%M:%S %z", "%a, %d %b %Y %H:%M:%S %Z"]:
-            try:
-                email_datetime = datetime.strptime(date_str, date_format)
-                return email_datetime
-            except ValueError:
-                logging.debug(f"Failed to parse date with format: {date_format}")
-        logging.error(f"Failed to parse date: {date_str}")
-        return None
+        if isinstance(date_str, str):
+            return _parse_date_cached(date_str)
+        return _parse_date(date_str)
 
-    def get_email_body(self, msg) -> str:
+    def trash_mail(self, uid):
+        super().trash_mail(uid)
+        self.connection.uid("store", uid, "+FLAGS", "\\Deleted")
+
+    def mail_key(self, uid: str, uid_validity: Optional[str] = None) -> str:
+        uid_validity = uid_validity or self.uid_validity
+        if uid_validity is None:
+            return uid
+        return f"{self._folder}:{uid_validity}:{uid}"
+
+    def existing_uids(self, uids: List[str]) -> Set[str]:
+        existing = set()
+        for i in range(0, len(uids), self.fetch_batch_size):
+            batch = uids[i : i + self.fetch_batch_size]
+            result, data = self.connection.uid("search", None, f"UID {','.join(batch)}")
+            if result != "OK":
+                _LOG.warning("Failed to check whether emails %s still exist.", batch)
+                return set(uids)
+            existing.update(uid.decode() for uid in data[0].split())
+        return existing
+
+    def get_body_and_attachments(
+        self, msg, uid: str, subject: str, sender: str, date: datetime
+    ) -> tuple:
         """
-        Extracts the body content from the email message.
+        Extracts the body content and saves the attachments of the email in a single walk over its parts.
 
         Args:
             msg: The email message object.
+            uid (str): The UID of the email.
+            subject (str): The subject of the email.
+            sender (str): The sender's email address.
+            date (datetime.datetime): The date when the email was sent.
 
         Returns:
-            str: The body content of the email as a string.
+            tuple: The body content of the email as a string and the list of file paths
+                where attachments have been saved.
         """
-        if msg.is_multipart():
-            for part in msg.walk():
-                if (
-                    part.get_content_type() == "text/plain"
-                    and part.get("Content-Disposition") is None
-                ):
-                    return part.get_payload(decode=True).decode()
+        # a single part email is its own body, unless it is e.g. a bare PDF
+        if not msg.is_multipart() and msg.get_content_maintype() == "text":
+            body_part = msg
         else:
-            return msg.get_payload(decode=True).decode()
-        return ""
+            body_part = None
+        html_part = None
+        saves = []
+        for part in _iter_leaf_parts(msg):
+            if part.get_content_disposition() is None:
+                if body_part is None:
+                    content_type = part.get_content_type()
+                    if content_type == "text/plain":
+                        body_part = part
+                    elif content_type == "text/html" and html_part is None:
+                        html_part = part
+                continue
+            filename = part.get_filename()
+            if filename:
+                saves.append(
+                    functools.partial(
+                        self.save_attachment, part, subject, sender, date, filename
+                    )
+                )
+        attachments = self._save_attachments(saves)
+        if body_part is None:
+            # emails without a text/plain part get the text of their HTML part
+            body_part = html_part
+        # the body is only decoded once it is clear that it is needed
+        if body_part is None or not self._wants_body(bool(attachments)):
+            return "", attachments
+        return self._decode_body(body_part), attachments
+
+    def _wants_body(self, has_attachments: bool) -> bool:
+        return self.store_body and (
+            has_attachments or not self.skip_body_without_attachments
+        )
 
-    def trash_mail(self, uid):
-        super().trash_mail(uid)
-        self.connection.store(uid, "+FLAGS", "\\Deleted")
+    def _save_attachments(self, saves: List[Callable[[], str]]) -> List[str]:
+        """
+        Runs the given attachment writes, in parallel if the email has several attachments.
 
-    def get_attachments(
-        self, msg, uid: str, subject: str, sender: str, date: str
-    ) -> List[str]:
+        The writes of one email run on a pool of their own, separate from the one
+        processing the emails, so that they never wait for each other.
+
+        Args:
+            saves (List[Callable[[], str]]): Functions writing one attachment each.
+
+        Returns:
+            List[str]: The file paths returned by the functions, in the same order.
+        """
+        if self.workers < 2 or len(saves) < 2:
+            return [save() for save in saves]
+        with self._attachment_executor_lock:
+            if self._attachment_executor is None:
+                self._attachment_executor = ThreadPoolExecutor(
+                    max_workers=self.workers, thread_name_prefix="attachments"
+                )
+        return list(self._attachment_executor.map(lambda save: save(), saves))
+
+    def _decode_body(self, part) -> str:
+        payload = part.get_payload(decode=True)
+        if payload is None:
+            return ""
+        body = _decode_text(payload, part.get_content_charset())
+        if part.get_content_type() == "text/html":
+            body = html_to_text(body)
+        return body
+
+    def save_attachment(
+        self, part, subject: str, sender: str, date: datetime, filename: str
+    ) -> str:
         """
-        Extracts and saves the attachments from the email.
+        Saves a single attachment part of the email.
 
         Args:
-            msg: The email message object.
-            uid (str): The UID of the email.
+            part: The message part holding the attachment.
             subject (str): The subject of the email.
             sender (str): The sender's email address.
             date (datetime.datetime): The date when the email was sent.
+            filename (str): The raw file name of the attachment.
 
         Returns:
-            List[str]: List of file paths where attachments have been saved.
+            str: The file path where the attachment has been saved.
         """
-        attachments = []
-        for part in msg.walk():
-            if part.get_content_maintype() == "multipart":
-                continue
-            if part.get("Content-Disposition") is None:
-                continue
-            filename = part.get_filename()
-            if filename:
-                payload = part.get_payload(decode=True)
-                output_path = self.attachment_handler.write_attachment(
-                    sender,
-                    subject,
-                    date,
-                    sanitize_filename(self.decode_header_value(filename)),
-                    payload,
-                )
-                attachments.append(output_path)
-                logging.info(f"Attachment saved to {output_path}")
-        return attachments
+        encoding = part.get("Content-Transfer-Encoding", "").strip().lower()
+        raw_payload = part.get_payload()
+        if isinstance(raw_payload, list):
+            # an attached email is saved as a whole
+            payload = raw_payload[0].as_bytes()
+        elif encoding in self._streamed_encodings:
+            payload = self.iter_decoded_payload(raw_payload, encoding)
+        else:
+            payload = part.get_payload(decode=True)
+        output_path = self.attachment_handler.write_attachment(
+            sender,
+            subject,
+            date,
+            sanitize_filename(self.decode_header_value(filename)),
+            payload,
+        )
+        _LOG.info("Attachment saved to %s", output_path)
+        return output_path
 
-    def close(self):
+    def noop(self):
         """
-        Closes the IMAP mailbox connection.
+        Sends a NOOP to keep the IMAP connection alive.
+
+        Raises:
+            imaplib.IMAP4.abort: If the connection has been dropped by the server.
+        """
+        self.connection.noop()
+
+    def expunge(self):
+        """
+        Permanently deletes the emails marked as deleted in the selected folder.
         """
         if self.delete_mails:
-            logging.info("permanently deleting marked emails")
+            _LOG.info("permanently deleting marked emails")
             self.connection.expunge()
 
-        logging.info("Closing the mailbox connection.")
+    def close(self):
+        """
+        Closes the IMAP mailbox connection.
+        """
+        self.expunge()
+
+        _LOG.info("Closing the mailbox connection.")
+
+        for connection in self._fetch_connections:
+            try:
+                connection.logout()
+            except Exception as e:
+                _LOG.debug("Error while closing a fetch connection: %s", e)
+        self._fetch_connections = []
+
+        if self._attachment_executor is not None:
+            self._attachment_executor.shutdown()
+            self._attachment_executor = None
 
         if self.connection:
             self.connection.close()
@@ -558,13 +1908,30 @@ class ExchangeMailbox(Mailbox):
         export_directory (str): Directory where email attachments will be saved.
         server (str): Exchange server address.
         account (Account): Exchangelib Account object representing the email account.
+        fetch_batch_size (int): Maximum number of emails requested with a single request.
+        mark_batch_size (int): Maximum number of emails marked as read with a single request.
     """
 
+    fetch_batch_size = 100
+    mark_batch_size = 100
+    # the fields of the messages that are needed to build a Mail
+    _fetch_fields = (
+        "message_id",
+        "subject",
+        "sender",
+        "to_recipients",
+        "datetime_received",
+        "body",
+        "attachments",
+        "is_read",
+    )
+
     def __init__(
         self,
         server: str,
         export_directory: str = "attachments",
         attachment_handler: AttachmentHandler = SimpleExporter,
+        workers: int = 1,
     ):
         """
         Initializes the ExchangeMailbox class.
@@ -572,10 +1939,13 @@ class ExchangeMailbox(Mailbox):
         Args:
             export_directory (str): Directory to save email attachments.
             server (str): Exchange server address.
+            workers (int): Number of threads used to parse emails and write their attachments.
         """
-        super().__init__(server, export_directory, attachment_handler)
+        super().__init__(server, export_directory, attachment_handler, workers)
         self.account = None
-        logging.debug(f"Using Exchange server: {self.server}")
+        # fetched messages by UID, until they are marked as read
+        self._unmarked = {}
+        _LOG.debug("Using Exchange server: %s", self.server)
 
     def connect(self, email_address: str, password: str):
         """
@@ -588,16 +1958,16 @@ class ExchangeMailbox(Mailbox):
         Raises:
             SystemExit: If the connection to the Exchange server fails due to invalid credentials or configuration.
         """
-        logging.info("Connecting to the Exchange server")
+        _LOG.info("Connecting to the Exchange server")
         try:
             cred = Credentials(email_address, password)
             config = Configuration(server=self.server, credentials=cred)
             self.account = Account(
                 email_address, config=config, autodiscover=False, credentials=cred
             )
-            logging.info(f"Connected successfully to Exchange server {self.server}")
+            _LOG.info("Connected successfully to Exchange server %s", self.server)
         except Exception as e:
-            logging.error(f"Failed to connect to Exchange server: {e}")
+            _LOG.error("Failed to connect to Exchange server: %s", e)
             raise SystemExit("Invalid credentials, server configuration or ")
 
     def select_folder(self, folder: str, public: bool = False):
@@ -612,22 +1982,28 @@ class ExchangeMailbox(Mailbox):
             Exception: If the folder cannot be found or selected.
         """
         if public:
-            logging.info("Selecting a public/shared folder!")
-        logging.info(f"Selecting the mailbox folder: {folder}")
+            _LOG.info("Selecting a public/shared folder!")
+        _LOG.info("Selecting the mailbox folder: %s", folder)
 
         root = self.account.public_folders_root if public else self.account.inbox
         try:
             self.folder = root / folder
         except Exception as e:
-            logging.error(f"Failed to select folder {folder}")
-            logging.error(e)
+            _LOG.error("Failed to select folder %s", folder)
+            _LOG.error(e)
             raise Exception(f"Folder {folder} not found!")
-        logging.info(f"Selected folder {folder}")
+        _LOG.info("Selected folder %s", folder)
 
-    def search_emails(self, filters: Optional[Dict] = {"is_read": False}) -> List[str]:
+    def search_emails(
+        self,
+        filters: Optional[Dict] = {"is_read": False},
+        since_uid: Optional[str] = None,
+    ) -> List[str]:
         """
         Searches for all unread email messages in the selected folder.
 
+        Exchange message IDs are not ordered, so since_uid is ignored.
+
         Returns:
             List[str]: A list of email UIDs (message IDs) found in the folder.
         """
@@ -643,23 +2019,23 @@ class ExchangeMailbox(Mailbox):
         for before_filter in ["min_age_days", "before"]:
             if before_filter in filters:
                 cutoff_date = CutOffDate(filters[before_filter])
-                logging.info(f"Looking for mails before {cutoff_date}")
+                _LOG.info("Looking for mails before %s", cutoff_date)
                 parsed_filters["datetime_received__lt"] = cutoff_date.datetime
 
         for after_filter in ["max_age_days", "after"]:
             if after_filter in filters:
                 cutoff_date = CutOffDate(filters[after_filter])
-                logging.info(f"Looking for mails after {cutoff_date}")
+                _LOG.info("Looking for mails after %s", cutoff_date)
                 parsed_filters["datetime_received__gt"] = cutoff_date.datetime
 
-
-        emails = list(
-            self.folder.filter(**parsed_filters).order_by("-datetime_received")
+        # only the message IDs are requested, the emails are fetched by get_mails
+        uids = list(
+            self.folder.filter(**parsed_filters)
+            .order_by("-datetime_received")
+            .values_list("message_id", flat=True)
         )
 
-        uids = [email.message_id for email in emails]
-
-        logging.info(f"Found {len(uids)} emails.")
+        _LOG.info("Found %s emails.", len(uids))
 
         return uids
 
@@ -673,20 +2049,62 @@ class ExchangeMailbox(Mailbox):
         Returns:
             Optional[Mail]: A Mail object containing the email's details if found, or None if not.
         """
-        logging.info(f"Fetching email with UID: {uid}")
+        _LOG.info("Fetching email with UID: %s", uid)
         try:
-            queryset = list(self.folder.filter(message_id=uid))
+            email = self.folder.filter(message_id=uid).only(*self._fetch_fields)[0]
+        except IndexError:
+            _LOG.warning("No email found with UID: %s", uid)
+            return None
+        except Exception as e:
+            _LOG.error("Error fetching email UID %s: %s", uid, e)
+            return None
+        return self.build_mail(uid, email)
+
+    def get_mails(self, uids: List[str]) -> Iterator[Mail]:
+        """
+        Fetches emails by their UIDs, requesting up to fetch_batch_size emails at once.
 
-            if not queryset or len(queryset) == 0:
-                logging.warning(f"No email found with UID: {uid}")
-                return None
+        Only the fields needed to build the Mail objects are requested.
 
-            email = queryset[0]
+        Args:
+            uids (List[str]): The UIDs of the emails to fetch.
 
-            if not email:
-                logging.warning(f"No email found with UID: {uid}")
-                return None
+        Returns:
+            Iterator[Mail]: Mail objects for all UIDs that could be fetched.
+        """
+        for i in range(0, len(uids), self.fetch_batch_size):
+            batch = uids[i : i + self.fetch_batch_size]
+            _LOG.info("Fetching %s emails", len(batch))
+            try:
+                emails = {
+                    email.message_id: email
+                    for email in self.folder.filter(message_id__in=batch).only(
+                        *self._fetch_fields
+                    )
+                }
+            except Exception as e:
+                _LOG.error("Error fetching %s emails: %s", len(batch), e)
+                continue
+            for uid in batch:
+                if uid not in emails:
+                    _LOG.warning("No email found with UID: %s", uid)
+                    continue
+                mail = self.build_mail(uid, emails[uid])
+                if mail:
+                    yield mail
+
+    def build_mail(self, uid: str, email: Message) -> Optional[Mail]:
+        """
+        Saves the attachments of a fetched email and returns it as Mail object.
 
+        Args:
+            uid (str): The UID of the email.
+            email (Message): The fetched email.
+
+        Returns:
+            Optional[Mail]: A Mail object containing the email's details, or None if it could not be processed.
+        """
+        try:
             subject = email.subject
             sender = str(email.sender.email_address)
             recipient = (
@@ -698,8 +2116,8 @@ class ExchangeMailbox(Mailbox):
             body = email.body
             attachments = self.get_attachments(email, subject, sender, date)
 
-            email.is_read = True
-            email.save()
+            # marked as read in bulk by mark_processed once the email is saved
+            self._unmarked[uid] = email
 
             return Mail(
                 uid=uid,
@@ -712,15 +2130,39 @@ class ExchangeMailbox(Mailbox):
             )
 
         except Exception as e:
-            logging.error(f"Error fetching email UID {uid}: {e}")
+            _LOG.error("Error processing email UID %s: %s", uid, e)
             return None
 
+    def mark_processed(self, uids: List[str]):
+        """
+        Marks the fetched emails as read, updating up to mark_batch_size emails per request.
+
+        Args:
+            uids (List[str]): The UIDs of the saved emails.
+        """
+        items = []
+        for uid in uids:
+            message = self._unmarked.pop(uid, None)
+            if message is not None and not message.is_read:
+                message.is_read = True
+                items.append((message, ("is_read",)))
+        if not items:
+            return
+        _LOG.info("Marking %s emails as read", len(items))
+        for result in self.account.bulk_update(items, chunk_size=self.mark_batch_size):
+            if isinstance(result, Exception):
+                _LOG.warning("Failed to mark an email as read: %s", result)
+
+    def forget_unprocessed(self):
+        # the unsaved emails stay unread and are fetched again in the next cycle
+        self._unmarked.clear()
+
     def trash_mail(self, uid):
         super().trash_mail(uid)
         try:
             queryset = self.folder.filter(message_id=uid)
         except Exception as e:
-            logging.error(f"Error fetching email (for trashing) UID {uid}: {e}")
+            _LOG.error("Error fetching email (for trashing) UID %s: %s", uid, e)
             return
         queryset.delete()
 
@@ -742,12 +2184,23 @@ class ExchangeMailbox(Mailbox):
         attachments = []
         for attachment in email.attachments:
             if isinstance(attachment, FileAttachment):
-                payload = attachment.content
-                output_path = self.attachment_handler.write_attachment(
-                    sender, subject, date, sanitize_filename(attachment.name), payload
-                )
+                # stream the content from the server instead of loading it at once
+                with attachment.fp as fp:
+                    payload = iter(
+                        functools.partial(
+                            fp.read, self.attachment_handler.write_chunk_size
+                        ),
+                        b"",
+                    )
+                    output_path = self.attachment_handler.write_attachment(
+                        sender,
+                        subject,
+                        date,
+                        sanitize_filename(attachment.name),
+                        payload,
+                    )
                 attachments.append(output_path)
-                logging.info(f"Attachment saved to {output_path}")
+                _LOG.info("Attachment saved to %s", output_path)
         return attachments
 
     def close(self):
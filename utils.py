@@ -1,55 +1,189 @@
+import functools
+import hashlib
+import html
 import logging
 import re
 import os
+import zlib
 from pathlib import Path
-from typing import Union
+from typing import Optional, Union
 from datetime import datetime, timedelta, timezone
 
+_LOG = logging.getLogger(__name__)
+
+# the supported date formats %Y-%m-%d and %d.%m.%Y, their fields are read directly
+# from the match instead of going through strptime
+_CUTOFF_DATE_PATTERNS = [
+    re.compile(r"(?P<year>\d{4})-(?P<month>\d{1,2})-(?P<day>\d{1,2})"),
+    re.compile(r"(?P<day>\d{1,2})\.(?P<month>\d{1,2})\.(?P<year>\d{4})"),
+]
+
+
+def _parse_cutoff_date(date_str: str) -> datetime:
+    for pattern in _CUTOFF_DATE_PATTERNS:
+        match = pattern.fullmatch(date_str)
+        if match:
+            try:
+                return datetime(**{k: int(v) for k, v in match.groupdict().items()})
+            except ValueError:
+                break
+    _LOG.error("Failed to parse date for CutOff Query!")
+    raise NotImplementedError
+
 
 class CutOffDate:
+    __slots__ = ("datetime", "_str")
+
     def __init__(self, x: Union[str, int]):
         if isinstance(x, int):
             self.datetime = datetime.now(timezone.utc) - timedelta(days=x)
         elif isinstance(x, str):
-
-            def parse_date(date_str):
-                for date_format in [
-                    "%Y-%m-%d",
-                    "%d.%m.%Y",
-                ]:
-                    try:
-                        date = datetime.strptime(date_str, date_format)
-                        return date
-                    except ValueError:
-                        logging.debug(
-                            f"Failed to parse date with format: {date_format}"
-                        )
-                logging.error("Failed to parse date for CutOff Query!")
-                raise NotImplementedError
-
-            self.datetime = parse_date(x)
-            self.datetime = self.datetime.replace(tzinfo=timezone.utc)
+            self.datetime = _parse_cutoff_date(x).replace(tzinfo=timezone.utc)
+        self._str = self.datetime.strftime("%d-%b-%Y")
 
     def __str__(self):
-        return self.datetime.strftime("%d-%b-%Y")
+        return self._str
+
+
+def uid_hash(uid: str) -> bytes:
+    """
+    Compute the database key for a mail UID.
+
+    Exchange message IDs can be well over 100 bytes long. Keying the database by a
+    16-byte BLAKE2b digest keeps the primary key index small regardless of the
+    mailbox type.
+
+    Args:
+        uid (str): The UID of the mail.
+
+    Returns:
+        bytes: The 16-byte digest of the UID.
+    """
+    return hashlib.blake2b(uid.encode(), digest_size=16).digest()
+
+
+def compress_text(text: str) -> bytes:
+    """
+    Compress a text for storage in the database.
+
+    Args:
+        text (str): The text to compress.
+
+    Returns:
+        bytes: The zlib compressed UTF-8 encoding of the text.
+    """
+    return zlib.compress(text.encode("utf-8"), 6)
+
+
+def decompress_text(value: Union[str, bytes, None]) -> Optional[str]:
+    """
+    Restore a text stored with compress_text.
+
+    Values that were stored uncompressed (as text) are returned unchanged.
+
+    Args:
+        value (Union[str, bytes, None]): The stored value.
+
+    Returns:
+        Optional[str]: The original text.
+    """
+    if isinstance(value, bytes):
+        return zlib.decompress(value).decode("utf-8")
+    return value
+
+
+# number of counters tried one by one before increment_filename scans the directory
+_INCREMENT_PROBES = 8
 
 
 def increment_filename(filepath: str) -> str:
-    base, extension = os.path.splitext(filepath)
-    counter = 1
-    new_filepath = filepath
-    while os.path.exists(new_filepath):
-        new_filepath = f"{base}_{counter}{extension}"
+    """
+    Find a free file name by appending a counter to the name of an existing file.
+
+    The first few counters are tried one by one, which resolves the common case of a
+    single collision with one or two stat calls. Only names with many copies fall back
+    to reading the directory once and placing the counter after the highest one in use.
+
+    Args:
+        filepath (str): The desired file path.
+
+    Returns:
+        str: filepath if it is free, otherwise base_<n>.ext with the next free counter n.
+    """
+    # lexists, since a dangling symlink also makes an exclusive create fail
+    if not os.path.lexists(filepath):
+        return filepath
+    directory, name = os.path.split(filepath)
+    base, extension = os.path.splitext(name)
+    base_path = os.path.join(directory, base)
+    for counter in range(1, _INCREMENT_PROBES + 1):
+        new_filepath = f"{base_path}_{counter}{extension}"
+        if not os.path.lexists(new_filepath):
+            return new_filepath
+    # case-insensitive, since the file system may be as well
+    pattern = re.compile(
+        rf"{re.escape(base)}_(\d+){re.escape(extension)}", re.IGNORECASE
+    )
+    counter = _INCREMENT_PROBES
+    with os.scandir(directory or ".") as entries:
+        for entry in entries:
+            match = pattern.fullmatch(entry.name)
+            if match:
+                counter = max(counter, int(match.group(1)))
+    new_filepath = f"{base_path}_{counter + 1}{extension}"
+    # names the directory listing spells differently, e.g. in another Unicode normal form
+    while os.path.lexists(new_filepath):
         counter += 1
+        new_filepath = f"{base_path}_{counter + 1}{extension}"
     return new_filepath
 
 
+# Colons are only kept for the drive of absolute Windows paths (see sanitize_filename).
+# Elsewhere a sanitized name can never be absolute, since "/" is replaced, so colons
+# are replaced in the same pass.
+_UNSAFE_FILENAME_CHARACTERS = re.compile(
+    r"[^\w\-_\.:\\ ]" if os.name == "nt" else r"[^\w\-_\.\\ ]"
+)
+# str.translate table for the common case of ASCII file names
+_UNSAFE_ASCII_TABLE = str.maketrans(
+    {c: "_" for c in map(chr, range(128)) if _UNSAFE_FILENAME_CHARACTERS.match(c)}
+)
+
+
+_HTML_HIDDEN_ELEMENTS = re.compile(
+    r"<(script|style|head)\b.*?</\1\s*>|<!--.*?-->", re.S | re.I
+)
+_HTML_LINE_BREAKS = re.compile(r"<br\s*/?>|</(?:p|div|tr|li|h[1-6])\s*>", re.I)
+_HTML_TAGS = re.compile(r"<[^>]*>")
+
+
+def html_to_text(markup: str) -> str:
+    """
+    Convert an HTML body to plain text.
+
+    This is a simple conversion for emails without a text/plain part: hidden elements
+    and tags are removed, line breaks are kept and entities are unescaped.
+
+    Args:
+        markup (str): The HTML document.
+
+    Returns:
+        str: The text content of the document.
+    """
+    text = _HTML_HIDDEN_ELEMENTS.sub("", markup)
+    text = _HTML_LINE_BREAKS.sub("\n", text)
+    text = _HTML_TAGS.sub("", text)
+    return html.unescape(text).strip()
+
+
+@functools.lru_cache(maxsize=1024)
 def sanitize_filename(filename: str) -> str:
     """
     Sanitize the filename to make it safe for filesystem use.
 
     This function replaces special characters in the filename with underscores
-    to ensure the filename is safe for use in the filesystem.
+    to ensure the filename is safe for use in the filesystem. Results are cached,
+    as the same prefixes and file names are sanitized for every attachment of an email.
 
     Args:
         filename (str): The original filename to sanitize.
@@ -57,18 +191,22 @@ def sanitize_filename(filename: str) -> str:
     Returns:
         str: The sanitized filename with special characters replaced by underscores.
     """
-    sanitized = re.sub(r"[^\w\-_\.:\\ ]", "_", filename)
-    sanitized_path = Path(sanitized)
-
-    if sanitized_path.is_absolute():
-        sanitized_path = Path(
-            *(
-                p if i == 0 else p.replace(":", "_")
-                for i, p in enumerate(sanitized_path.parts)
-            )
-        )
-        sanitized = str(sanitized_path)
+    if filename.isascii():
+        sanitized = filename.translate(_UNSAFE_ASCII_TABLE)
     else:
-        sanitized = sanitized.replace(":", "_")
-    logging.debug(f"Sanitized filename: {filename} -> {sanitized}")
+        sanitized = _UNSAFE_FILENAME_CHARACTERS.sub("_", filename)
+
+    if ":" in sanitized:
+        sanitized_path = Path(sanitized)
+        if sanitized_path.is_absolute():
+            sanitized_path = Path(
+                *(
+                    p if i == 0 else p.replace(":", "_")
+                    for i, p in enumerate(sanitized_path.parts)
+                )
+            )
+            sanitized = str(sanitized_path)
+        else:
+            sanitized = sanitized.replace(":", "_")
+    _LOG.debug("Sanitized filename: %s -> %s", filename, sanitized)
     return sanitized